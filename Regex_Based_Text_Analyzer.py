@@ -1,13 +1,540 @@
-import tkinter as tk
-from tkinter import messagebox
-from tkinter import simpledialog as _sd  # keep alias in case used elsewhere
-from tkinter import filedialog
-import tkinter.ttk as ttk
-from PIL import Image, ImageTk, ImageDraw, ImageFont
-import graphviz
+import bisect
+import copy
+import hashlib
+import io
+import json
 import os
+import random
+import re
+import stat
+import string
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict, deque
+from collections.abc import ItemsView, Mapping
 from pathlib import Path
 
+# Index of the reserved dead (sink) state in every compiled table
+DEAD = 0
+DEFAULT_CHUNK_SIZE = 1 << 20
+DEFAULT_PARALLEL_CHUNK = 16 << 20
+DEFAULT_LAZY_STATES = 10000
+MAX_CODE_POINT = 0x10FFFF
+DEFAULT_RING_SIZE = 16
+
+# Trace modes of DFA.process
+TRACE_NONE = 'none'
+TRACE_PATH = 'path'
+TRACE_ARRAY = 'array'
+TRACE_RING = 'ring'
+TRACE_COUNTS = 'counts'
+
+# Level-of-detail modes of DFA.visualize
+LOD_FULL = 'full'   # every state and transition
+LOD_PATH = 'path'   # states within `hops` of the path, the rest as one summary node
+LOD_SCC = 'scc'     # strongly connected components off the path as summary nodes
+# Above this many states visualize() defaults to LOD_PATH
+DEFAULT_LOD_STATES = 200
+# Node and edge budgets of the reduced modes, so dot's input stays small
+DEFAULT_MAX_NODES = 80
+DEFAULT_MAX_EDGES = 200
+
+
+# GUI and rendering libraries are imported on first use (see _require_gui and
+# _require_pil) so headless use of the DFA classes starts fast
+tk = ttk = messagebox = filedialog = _sd = None
+Image = ImageTk = ImageDraw = ImageFont = None
+
+
+def _require_pil():
+    global Image, ImageDraw, ImageFont
+    if Image is None:
+        from PIL import Image, ImageDraw, ImageFont
+
+
+def _require_gui():
+    global tk, ttk, messagebox, filedialog, _sd, ImageTk
+    _require_pil()
+    if tk is None:
+        import tkinter as tk
+        from tkinter import messagebox
+        from tkinter import simpledialog as _sd  # keep alias in case used elsewhere
+        from tkinter import filedialog
+        import tkinter.ttk as ttk
+        from PIL import ImageTk
+
+
+# --- Instrumentation ---
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ('metrics', 'name', 'start', 'children')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.children = 0
+        self.metrics._stack().append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter_ns() - self.start
+        stack = self.metrics._stack()
+        stack.pop()
+        parent = stack[-1] if stack else None
+        if parent is not None:
+            parent.children += elapsed
+        self.metrics._record(self.name, parent.name if parent else None, elapsed, elapsed - self.children)
+        return False
+
+
+class _Capture:
+    # Phases finished and counter increments made on one thread while a
+    # capture is active (see Metrics.capture); work on other threads, even
+    # at the same time, is not included
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.phases = []
+        self.counters = Counter()
+
+    def __enter__(self):
+        local = self.metrics._local
+        self._outer = getattr(local, 'capture', None)
+        local.capture = self
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._local.capture = self._outer
+        return False
+
+    def totals(self):
+        # {phase: seconds} summed over repeated phases, in first-seen order
+        out = {}
+        for name, ns in self.phases:
+            out[name] = out.get(name, 0) + ns / 1e9
+        return out
+
+
+class Metrics:
+    # Named phase timers (nested, per thread) and counters. While disabled,
+    # phase() returns a shared no-op context and count() returns at once, so
+    # instrumented code pays one attribute check. Hot loops are never timed:
+    # the engine counts steps once per call. `sink`, if set, is called with
+    # an event dict for every finished phase and every count.
+    def __init__(self, enabled=False, sink=None):
+        self.enabled = enabled
+        self.sink = sink
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.timers = {}    # name -> [calls, total_ns, self_ns, max_ns, last_ns]
+            self.callers = {}   # (name, parent) -> [calls, total_ns, self_ns]
+            self.counters = Counter()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def capture(self):
+        return _Capture(self)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += n
+        capture = getattr(self._local, 'capture', None)
+        if capture is not None:
+            capture.counters[name] += n
+        if self.sink is not None:
+            self.sink({'type': 'count', 'name': name, 'n': n})
+
+    def _record(self, name, parent, elapsed, own):
+        with self._lock:
+            t = self.timers.get(name)
+            if t is None:
+                t = self.timers[name] = [0, 0, 0, 0, 0]
+            t[0] += 1
+            t[1] += elapsed
+            t[2] += own
+            t[3] = max(t[3], elapsed)
+            t[4] = elapsed
+            c = self.callers.get((name, parent))
+            if c is None:
+                c = self.callers[(name, parent)] = [0, 0, 0]
+            c[0] += 1
+            c[1] += elapsed
+            c[2] += own
+        capture = getattr(self._local, 'capture', None)
+        if capture is not None:
+            capture.phases.append((name, elapsed))
+        if self.sink is not None:
+            self.sink({'type': 'phase', 'name': name, 'parent': parent, 'seconds': elapsed / 1e9})
+
+    def snapshot(self):
+        # JSON-ready copy of all timers (seconds) and counters
+        with self._lock:
+            timers = {name: {'calls': n, 'total': total / 1e9, 'self': own / 1e9,
+                             'mean': total / n / 1e9, 'max': top / 1e9, 'last': last / 1e9}
+                      for name, (n, total, own, top, last) in self.timers.items()}
+            return {'timers': timers, 'counters': dict(self.counters)}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def pstats_dict(self):
+        # Timers in the layout pstats.Stats loads: each phase is a pseudo
+        # function ('dfa', 0, name) and its enclosing phase is the caller
+        def key(name):
+            return ('dfa', 0, name)
+
+        with self._lock:
+            stats = {key(name): (n, n, own / 1e9, total / 1e9, {})
+                     for name, (n, total, own, _, _) in self.timers.items()}
+            for (name, parent), (n, total, own) in self.callers.items():
+                if parent is not None:
+                    stats[key(name)][4][key(parent)] = (n, n, own / 1e9, total / 1e9)
+        return stats
+
+    def dump(self, path):
+        # Write a .prof/.pstats file (marshalled, for pstats/snakeviz) or JSON
+        path = str(path)
+        if path.endswith(('.prof', '.pstats')):
+            import marshal
+
+            with open(path, 'wb') as fh:
+                marshal.dump(self.pstats_dict(), fh)
+        else:
+            with open(path, 'w', encoding='utf-8') as fh:
+                fh.write(self.to_json(indent=2))
+        return path
+
+
+# Process-wide instance used by the engine, renderer, CLI and GUI; set
+# DFA_METRICS=1 to enable it from the start
+METRICS = Metrics(enabled=os.environ.get('DFA_METRICS', '') not in ('', '0'))
+
+
+def _format_timings(totals, limit=None):
+    # "graphviz 84.1 ms, render 3.2 ms" for the status bar and inspector
+    items = list(totals.items())[:limit]
+    return ", ".join(f"{name} {sec * 1000:.1f} ms" for name, sec in items)
+
+
+def _iter_chunks(source, chunk_size):
+    # Yield bytes-like chunks of at most chunk_size from a path, a binary file
+    # object, an mmap or any buffer. A single buffer is reused for file reads.
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fh:
+            yield from _iter_chunks(fh, chunk_size)
+        return
+    if hasattr(source, 'readinto'):
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while True:
+            n = source.readinto(buf)
+            if not n:
+                return
+            yield view[:n]
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        view = memoryview(source).cast('B')
+        for i in range(0, len(view), chunk_size):
+            yield view[i:i + chunk_size]
+
+
+class CompiledDFA:
+    # Dense integer form of a DFA: states and symbols are numbered and the
+    # transitions live in one flat int table indexed by state * width + column.
+    # Row 0 is the dead state; the last column catches symbols outside the alphabet.
+    # A column may stand for a range of characters (see _symbol_classes).
+    def __init__(self, state_names, symbols, table, start, accepting):
+        self.state_names = state_names          # index -> name (index 0 is DEAD -> None)
+        self.state_index = {name: i for i, name in enumerate(state_names) if i != DEAD}
+        self.symbols = symbols                  # column -> symbol
+        self.width = len(symbols) + 1
+        self.unknown_col = len(symbols)
+        self.symbol_index = _Columns(symbols)
+        self.table = table                      # array('i') of len(state_names) * width
+        self.start = start
+        self.accepting = accepting              # bytearray, 1 for final states
+        self._byte_columns = None
+        self._offset_table = None
+
+    def __getstate__(self):
+        # Tables mapped from a binary file are memoryviews; ship them as arrays
+        state = self.__dict__.copy()
+        if not isinstance(self.table, array):
+            state['table'] = array('i', self.table)
+        return state
+
+    @property
+    def num_states(self):
+        return len(self.state_names)
+
+    def column(self, symbol):
+        return self.symbol_index[symbol]
+
+    def step(self, state, symbol):
+        return self.table[state * self.width + self.column(symbol)]
+
+    def run(self, input_string, state=None):
+        # Walk the table from `state` (default: start); returns the last live
+        # state and the number of symbols consumed before hitting DEAD.
+        table, width, cols = self.table, self.width, self.symbol_index
+        s = self.start if state is None else state
+        consumed = 0
+        for ch in input_string:
+            nxt = table[s * width + cols[ch]]
+            if nxt == DEAD:
+                return s, consumed
+            s = nxt
+            consumed += 1
+        return s, consumed
+
+    def byte_columns(self):
+        # 256-entry byte -> column map (bytes are read as Latin-1 characters)
+        if self._byte_columns is None:
+            self._byte_columns = array('i', (self.column(chr(b)) for b in range(256)))
+        return self._byte_columns
+
+    def char_columns(self):
+        # (lo, hi, column) for every character the table reads, sorted by code
+        # point. Multi-character symbols are left out: input is read one
+        # character at a time, so they never match.
+        spans = [(ord(sym), ord(sym), col) for col, sym in enumerate(self.symbols)
+                 if isinstance(sym, str) and len(sym) == 1]
+        spans.extend(self.symbol_index.ranges())
+        spans.sort()
+        return spans
+
+    def offset_table(self):
+        # Same table with every target pre-multiplied by width, so the hot loop
+        # is a single add + index per byte
+        if self._offset_table is None:
+            w = self.width
+            self._offset_table = array('i', (v * w for v in self.table))
+        return self._offset_table
+
+    def run_bytes(self, data, state):
+        # Advance over a bytes-like chunk; returns (state, index of first byte
+        # that led to DEAD or None). DEAD is absorbing, so it is only searched
+        # for once the chunk is done.
+        table, width, bmap = self.offset_table(), self.width, self.byte_columns()
+        off = state * width
+        for b in data:
+            off = table[off + bmap[b]]
+        if off != DEAD:
+            return off // width, None
+        off = state * width
+        for i, b in enumerate(data):
+            off = table[off + bmap[b]]
+            if off == DEAD:
+                return DEAD, i
+        return DEAD, None
+
+
+class _SharedInput:
+    # Exposes the input of process_parallel() as one buffer the parent can
+    # slice, plus what workers need to map the same bytes: a file path and
+    # start offset (mmapped on both sides) or the name of a SharedMemory
+    # block holding a copy.
+    def __init__(self, source):
+        self.path = None
+        self.offset = 0
+        self.shm_name = None
+        self._mmap = None
+        self._shm = None
+        if hasattr(source, 'read'):
+            path = _file_object_path(source)
+            if path is None:
+                source = source.read()
+            else:
+                self.offset = source.tell()
+                source.seek(0, os.SEEK_END)
+                source = path
+        if isinstance(source, (str, os.PathLike)):
+            self.path = os.fspath(source)
+            self._mmap = _map_file(self.path)
+            self.data = memoryview(self._mmap)[self.offset:]
+        else:
+            from multiprocessing import shared_memory
+            view = memoryview(source).cast('B')
+            self._shm = shared_memory.SharedMemory(create=True, size=max(len(view), 1))
+            self._shm.buf[:len(view)] = view
+            self.shm_name = self._shm.name
+            self.data = self._shm.buf[:len(view)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.data.release()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+        elif hasattr(self._mmap, 'close'):
+            self._mmap.close()
+
+
+def _file_object_path(fh):
+    # Path of the regular file a binary file object reads, or None (pipes,
+    # sockets, BytesIO, text files)
+    name = getattr(fh, 'name', None)
+    if isinstance(fh, io.TextIOBase) or not isinstance(name, (str, bytes, os.PathLike)):
+        return None
+    try:
+        st = os.fstat(fh.fileno())
+        if stat.S_ISREG(st.st_mode) and os.path.samestat(st, os.stat(name)):
+            return name
+    except (OSError, ValueError, io.UnsupportedOperation):
+        pass
+    return None
+
+
+def _map_file(path):
+    import mmap
+    with open(path, 'rb') as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# Per-process state of process_parallel() workers, set by the pool initializer
+_PARALLEL = {}
+# Below this many distinct live states a chunk is finished with the scalar loop
+_SCALAR_STATES = 8
+# process_parallel() first steps every state over this many bytes of the input
+# (or until this many state steps are spent) to see how far they merge
+_PROBE_BYTES = 4096
+_PROBE_STEPS = 1 << 24
+
+
+def _attach_shared_memory(name):
+    # Attach without registering with the resource tracker: the parent owns
+    # the block and unlinks it (track=False only exists on Python 3.13+)
+    from multiprocessing import resource_tracker, shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _init_parallel_worker(compiled, path, shm_name, offset=0):
+    import numpy as np
+
+    if path is not None:
+        data = memoryview(_map_file(path))[offset:]
+    else:
+        shm = _PARALLEL['shm'] = _attach_shared_memory(shm_name)
+        data = shm.buf
+    _PARALLEL.update(dfa=compiled, data=data, **_column_tables(compiled))
+
+
+def _column_tables(compiled):
+    # The transition table by column and the column of each byte, as arrays
+    import numpy as np
+
+    table = np.frombuffer(compiled.table, dtype=np.int32).reshape(compiled.num_states, compiled.width)
+    return {'by_column': np.ascontiguousarray(table.T),
+            'byte_columns': np.frombuffer(compiled.byte_columns(), dtype=np.int32)}
+
+
+def _merge_states(by_column, cols, length, done):
+    # Advance every state over cols together, merging duplicates every 64
+    # bytes, until done(bytes stepped, live states) holds. Returns the
+    # distinct current states, the index into them of each original state,
+    # the bytes stepped and the live (not dead) state count.
+    import numpy as np
+
+    cur = np.arange(by_column.shape[1], dtype=np.int32)
+    owner = np.arange(by_column.shape[1])
+    i = 0
+    live = np.count_nonzero(cur)
+    while i < length and live > 1 and not done(i, live):
+        end = min(i + 64, length)
+        for col in cols[i:end]:
+            cur = by_column[col][cur]
+        i = end
+        cur, inverse = np.unique(cur, return_inverse=True)
+        owner = inverse.reshape(-1)[owner]
+        live = np.count_nonzero(cur)
+    return cur, owner, i, live
+
+
+def _scalar_from(i, live):
+    # When a chunk mapping switches from stepping all states to the scalar loop
+    return i >= 256 and live <= _SCALAR_STATES
+
+
+def _live_after_probe(compiled, data):
+    # Distinct live states left after stepping all states over the start of
+    # data. A chunk mapping costs about one scan of the chunk per such state,
+    # so when they stay many the parallel path does more work than a single
+    # sequential scan.
+    import numpy as np
+
+    tables = _column_tables(compiled)
+    probe = np.frombuffer(data[:_PROBE_BYTES], dtype=np.uint8)
+    cols = tables['byte_columns'][probe]
+    budget = _PROBE_STEPS // max(compiled.num_states, 1)
+    return _merge_states(tables['by_column'], cols, len(cols),
+                         lambda i, live: _scalar_from(i, live) or i >= budget)[3]
+
+
+def _chunk_mapping(offset, length):
+    # State -> state mapping of one chunk. All states are advanced together and
+    # duplicates are merged periodically; once only a few live states remain,
+    # each of them walks the rest of the chunk with the scalar loop.
+    import numpy as np
+
+    c = _PARALLEL['dfa']
+    chunk = _PARALLEL['data'][offset:offset + length]
+    cols = _PARALLEL['byte_columns'][np.frombuffer(chunk, dtype=np.uint8)]
+    cur, owner, i, _ = _merge_states(_PARALLEL['by_column'], cols, length, _scalar_from)
+    if i < length:
+        rest = chunk[i:]
+        cur = np.array([c.run_bytes(rest, int(s))[0] if s != DEAD else DEAD for s in cur],
+                       dtype=np.int32)
+    return cur[owner].astype(np.int32).tobytes()
+
+
 class DFA:
     def __init__(self, states, alphabet, transitions, start_state, final_states):
         self.states = states
@@ -15,55 +542,2788 @@ class DFA:
         self.transitions = transitions
         self.start_state = start_state
         self.final_states = final_states
+        self.compiled = None
+        self._fingerprint = None
+
+    def compile(self):
+        # Build the integer transition table used by process(). Call again after
+        # mutating states/transitions in place; a fresh DFA compiles lazily.
+        names = [None]
+        index = {}
+
+        def state_id(name):
+            i = index.get(name)
+            if i is None:
+                i = index[name] = len(names)
+                names.append(name)
+            return i
+
+        state_id(self.start_state)
+        for state in sorted(self.states, key=str):
+            state_id(state)
+        symbols = sorted(set(self.alphabet) | {sym for (_, sym) in self.transitions}, key=str)
+        for (src, _), dst in self.transitions.items():
+            state_id(src)
+            state_id(dst)
+
+        if any(map(is_range_symbol, symbols)):
+            symbols, table = self._class_table(symbols, index)
+        else:
+            cols = {sym: col for col, sym in enumerate(symbols)}
+            width = len(symbols) + 1
+            table = array('i', [DEAD]) * (len(names) * width)
+            for (src, sym), dst in self.transitions.items():
+                table[index[src] * width + cols[sym]] = index[dst]
+
+        accepting = bytearray(len(names))
+        for state in self.final_states:
+            if state in index:
+                accepting[index[state]] = 1
+
+        self.compiled = CompiledDFA(names, symbols, table, index[self.start_state], accepting)
+        return self.compiled
+
+    def _class_table(self, symbols, index):
+        # Table over symbol equivalence classes for alphabets with range
+        # symbols: one column per class instead of one per character. A plain
+        # character takes precedence over a range containing it; two ranges
+        # that overlap must lead to the same state.
+        labels, cover = _symbol_classes(symbols)
+        width = len(labels) + 1
+        table = array('i', [DEAD]) * ((len(index) + 1) * width)
+        plain = []
+        for (src, sym), dst in self.transitions.items():
+            if not is_range_symbol(sym):
+                plain.append((src, sym, dst))
+                continue
+            row, d = index[src] * width, index[dst]
+            for col in cover[sym]:
+                if table[row + col] not in (DEAD, d):
+                    raise ValueError(f"Overlapping ranges from state {src} lead to different states "
+                                     f"(at {sym!r}, {labels[col]!r})")
+                table[row + col] = d
+        for src, sym, dst in plain:
+            row, d = index[src] * width, index[dst]
+            for col in cover[sym]:
+                table[row + col] = d
+        return labels, table
+
+    @classmethod
+    def from_compiled(cls, compiled, alphabet=None):
+        # Wrap a compiled table (e.g. from load_dfa_binary) without rebuilding a
+        # transition dict; `transitions` becomes a read-only view of the table
+        dfa = cls.__new__(cls)
+        dfa.states = set(compiled.state_names[1:])
+        dfa.alphabet = set(compiled.symbols if alphabet is None else alphabet)
+        dfa.transitions = _TableTransitions(compiled)
+        dfa.start_state = compiled.state_names[compiled.start]
+        dfa.final_states = {name for name, acc in zip(compiled.state_names, compiled.accepting) if acc}
+        dfa.compiled = compiled
+        dfa._fingerprint = None
+        return dfa
+
+    def save_binary(self, path):
+        save_dfa_binary(self, path)
+
+    def fingerprint(self):
+        # SHA-256 of the canonical text form (see dfa_to_text), which fixes
+        # both the verdicts and the diagram; keys the ResultCache. Kept until
+        # compile() runs again.
+        c = self.compiled or self.compile()
+        if self._fingerprint is None or self._fingerprint[0] is not c:
+            digest = hashlib.sha256(dfa_to_text(self).encode('utf-8')).hexdigest()
+            self._fingerprint = (c, digest)
+        return self._fingerprint[1]
+
+    def process(self, input_string, trace=TRACE_PATH, ring_size=DEFAULT_RING_SIZE):
+        # Returns (accepted, trace). trace selects what is recorded:
+        #   'path'   list of state names (default)
+        #   'array'  array('I') of compiled state indices
+        #   'ring'   deque of the last ring_size state names
+        #   'counts' array('I') of hits per table cell (state * width + column),
+        #            see edge_counts()
+        #   'none'   nothing (pure acceptance)
+        c = self.compiled or self.compile()
+        table, width, cols = c.table, c.width, c.symbol_index
+        s = c.start
+        if trace == TRACE_NONE:
+            s, consumed = c.run(input_string)
+            if METRICS.enabled:
+                METRICS.count('steps', consumed)
+            return consumed == len(input_string) and bool(c.accepting[s]), None
+        if trace == TRACE_COUNTS:
+            counts = array('I', [0]) * len(table)
+            for ch in input_string:
+                cell = s * width + cols[ch]
+                s = table[cell]
+                if s == DEAD:
+                    return False, counts
+                counts[cell] += 1
+            return bool(c.accepting[s]), counts
+        if trace == TRACE_RING:
+            ring = deque([s], maxlen=ring_size)
+            for ch in input_string:
+                s = table[s * width + cols[ch]]
+                if s == DEAD:
+                    return False, deque((c.state_names[i] for i in ring), maxlen=ring_size)
+                ring.append(s)
+            return bool(c.accepting[s]), deque((c.state_names[i] for i in ring), maxlen=ring_size)
+        if trace not in (TRACE_PATH, TRACE_ARRAY):
+            raise ValueError(f"Unknown trace mode: {trace!r}")
+        states = array('I', [s])
+        accepted = False
+        for ch in input_string:
+            s = table[s * width + cols[ch]]
+            if s == DEAD:
+                break
+            states.append(s)
+        else:
+            accepted = bool(c.accepting[s])
+        if METRICS.enabled:
+            METRICS.count('steps', len(states) - 1)
+        if trace == TRACE_ARRAY:
+            return accepted, states
+        return accepted, [c.state_names[i] for i in states]
+
+    def edge_counts(self, counts):
+        # Expand a 'counts' trace into {(state, symbol): hits} for the hit edges,
+        # keyed like `transitions`. A table over range classes names a class
+        # per column; its hits go to the transition that covers the class.
+        c = self.compiled or self.compile()
+        hits = {}
+        owner = None
+        for cell, n in enumerate(counts):
+            if not n:
+                continue
+            state, col = c.state_names[cell // c.width], cell % c.width
+            key = (state, c.symbols[col])
+            if key not in self.transitions:
+                if owner is None:
+                    owner = self._class_owners()
+                key = (state, owner[state, col])
+            hits[key] = hits.get(key, 0) + n
+        return hits
+
+    def _class_owners(self):
+        # {(state, class column): transition symbol} for a range-class table,
+        # with plain characters taking precedence as in _class_table
+        symbols = sorted(set(self.alphabet) | {sym for (_, sym) in self.transitions}, key=str)
+        _, cover = _symbol_classes(symbols)
+        owner = {}
+        for (src, sym) in self.transitions:
+            for col in cover[sym]:
+                if not is_range_symbol(sym) or (src, col) not in owner:
+                    owner[src, col] = sym
+        return owner
+
+    def _edge_hits(self, input_string):
+        # {(state, symbol): hits} of the transitions input_string takes
+        return self.edge_counts(self.process(input_string, TRACE_COUNTS)[1])
+
+    def process_stream(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+        # Scan a file path, binary file object, mmap or bytes-like object in
+        # fixed-size chunks, carrying only the current state between chunks.
+        # Each byte is one symbol (Latin-1). Returns (accepted, bytes_consumed,
+        # fail_pos) where fail_pos is the offset of the first undefined transition.
+        c = self.compiled or self.compile()
+        s = c.start
+        consumed = 0
+        for chunk in _iter_chunks(source, chunk_size):
+            s, fail = c.run_bytes(chunk, s)
+            if fail is not None:
+                if METRICS.enabled:
+                    METRICS.count('steps', consumed + fail)
+                return False, consumed + fail, consumed + fail
+            consumed += len(chunk)
+        if METRICS.enabled:
+            METRICS.count('steps', consumed)
+        return bool(c.accepting[s]), consumed, None
+
+    def process_parallel(self, source, workers=None, chunk_size=DEFAULT_PARALLEL_CHUNK):
+        # Same result as process_stream(), but chunks are evaluated on a process
+        # pool. Each worker turns its chunk into a state -> state mapping vector
+        # and the vectors are composed in order. Accepts the same sources as
+        # process_stream: files (by path, or a binary file object opened on
+        # one, from its current position) are mmapped by every worker; other
+        # file objects are read, and in-memory buffers copied, once into
+        # shared memory. A file object is left at its end, as after
+        # process_stream.
+        # This only pays off for automata that forget their state: a chunk
+        # costs about one scan per state its start states merge into, so it
+        # helps when all states merge into fewer than `workers` within the
+        # first few KiB (typical for scanners and patterns with .* or
+        # restarting prefixes). Counters, cycles and other automata that keep
+        # many states apart are checked on a probe of the input first and
+        # run with process_stream instead.
+        from concurrent.futures import ProcessPoolExecutor
+        import numpy as np
+
+        c = self.compiled or self.compile()
+        workers = workers or os.cpu_count() or 1
+        with _SharedInput(source) as shared:
+            total = len(shared.data)
+            if workers == 1 or total <= chunk_size or _live_after_probe(c, shared.data) >= workers:
+                return self.process_stream(shared.data, chunk_size)
+            spans = [(off, min(chunk_size, total - off)) for off in range(0, total, chunk_size)]
+            s = c.start
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_parallel_worker,
+                                     initargs=(c, shared.path, shared.shm_name, shared.offset)) as pool:
+                futures = [pool.submit(_chunk_mapping, off, length) for off, length in spans]
+                for (off, length), future in zip(spans, futures):
+                    nxt = int(np.frombuffer(future.result(), dtype=np.int32)[s])
+                    if nxt == DEAD:
+                        for f in futures:
+                            f.cancel()
+                        _, fail = c.run_bytes(shared.data[off:off + length], s)
+                        return False, off + fail, off + fail
+                    s = nxt
+            return bool(c.accepting[s]), total, None
+
+    def accepts_many(self, strings):
+        # Batch acceptance test: returns a boolean NumPy array, one entry per input.
+        # Strings of equal length are stepped in lockstep as integer column arrays.
+        import numpy as np
+
+        c = self.compiled or self.compile()
+        if not isinstance(strings, (list, tuple)):
+            strings = list(strings)
+        n = len(strings)
+        result = np.zeros(n, dtype=bool)
+        if n == 0:
+            return result
+
+        table = np.frombuffer(c.table, dtype=np.int32).reshape(c.num_states, c.width)
+        accepting = np.frombuffer(bytes(c.accepting), dtype=np.uint8).astype(bool)
+
+        by_length = {}
+        for i, s in enumerate(strings):
+            by_length.setdefault(len(s), []).append(i)
+        if METRICS.enabled:
+            # every string is stepped to its end, dead or not
+            METRICS.count('steps', sum(length * len(idx) for length, idx in by_length.items()))
+
+        lut = None
+        for length, idx in by_length.items():
+            idx = np.asarray(idx, dtype=np.intp)
+            if length == 0:
+                result[idx] = accepting[c.start]
+                continue
+            joined = ''.join([strings[i] for i in idx])
+            codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)
+            top = int(codes.max())
+            if lut is None or top >= len(lut):
+                lut = self._column_lut(c, top + 1)
+            cols = lut[codes].reshape(len(idx), length)
+            states = np.full(len(idx), c.start, dtype=np.int32)
+            for j in range(length):
+                states = table[states, cols[:, j]]
+            result[idx] = accepting[states]
+        return result
+
+    @staticmethod
+    def _column_lut(c, size):
+        # Code point -> table column lookup for the vectorized paths
+        import numpy as np
+
+        lut = np.full(max(size, 256), c.unknown_col, dtype=np.int32)
+        for lo, hi, col in c.symbol_index.ranges():
+            if lo < len(lut):
+                lut[lo:hi + 1] = col
+        for sym, col in c.symbol_index.items():
+            if isinstance(sym, str) and len(sym) == 1 and ord(sym) < len(lut):
+                lut[ord(sym)] = col
+        return lut
+
+    def accepts_trie(self, strings):
+        # Batch acceptance over the implicit trie of the inputs: strings are
+        # visited in sorted order and each resumes from the states of the
+        # prefix it shares with the previous one, so a shared prefix (URLs,
+        # paths) is stepped once. Returns a list of bools in input order.
+        if not isinstance(strings, (list, tuple)):
+            strings = list(strings)
+        result = [False] * len(strings)
+        path = [self._stepper()[0]]
+        flushes = getattr(self, 'flushes', 0)
+        prev = ''
+        for i in sorted(range(len(strings)), key=strings.__getitem__):
+            text = strings[i]
+            del path[_common_prefix_len(prev, text) + 1:]
+            result[i] = self._extend_path(text, path)
+            prev = text
+            if getattr(self, 'flushes', 0) != flushes:
+                # a lazy cache was flushed: the ids on the path are stale
+                path, prev, flushes = [self._stepper()[0]], '', self.flushes
+        return result
+
+    def _extend_path(self, text, path):
+        # path[i] is the state after text[:i]; step from path[-1] over the rest
+        # of text, appending each state. A dead step is not appended, so the
+        # path stops where the input died. Returns whether text is accepted.
+        c = self.compiled or self.compile()
+        table, width, cols = c.table, c.width, c.symbol_index
+        done = len(path) - 1
+        s = path[-1]
+        for ch in text[done:]:
+            s = table[s * width + cols[ch]]
+            if s == DEAD:
+                break
+            path.append(s)
+        if METRICS.enabled:
+            METRICS.count('steps', len(path) - 1 - done)
+        return s != DEAD and bool(c.accepting[s])
+
+    def _stepper(self):
+        # (start, step(state, symbol), final_of(state)) used by the scanners;
+        # final_of returns None for non-final states
+        c = self.compiled or self.compile()
+        table, width, cols, accepting = c.table, c.width, c.symbol_index, c.accepting
+
+        def step(s, ch):
+            return table[s * width + cols[ch]]
+
+        def final_of(s):
+            return True if accepting[s] else None
+
+        return c.start, step, final_of
+
+    def finditer(self, text):
+        # Yield (start, end) of every non-empty leftmost-longest match in one
+        # left-to-right pass, restarting from the start state after each match
+        for start, end, _ in _leftmost_longest(text, *self._stepper()):
+            yield start, end
+
+    @classmethod
+    def from_regex(cls, pattern, lazy=True, max_states=DEFAULT_LAZY_STATES, alphabet=None):
+        # Build an automaton accepting exactly the strings matching `pattern`.
+        # The lazy form determinizes on demand; lazy=False materializes every
+        # state over `alphabet` (default: the character classes of the pattern).
+        rx = RegexDFA(pattern, max_states)
+        return rx if lazy else rx.materialize(alphabet, max_states)
+
+    def minimize(self):
+        # Hopcroft minimization, O(n * |alphabet| * log n). Unreachable states and
+        # states equivalent to the dead state are dropped. Each class is named
+        # after its first member; returns (minimal DFA, {old state: new state}).
+        c = self.compiled or self.compile()
+        table, width, ncols = c.table, c.width, len(c.symbols)
+
+        reachable = {DEAD, c.start}
+        stack = [c.start]
+        while stack:
+            s = stack.pop()
+            row = s * width
+            for col in range(ncols):
+                t = table[row + col]
+                if t not in reachable:
+                    reachable.add(t)
+                    stack.append(t)
+
+        inverse = [dict() for _ in range(ncols)]
+        for s in reachable:
+            row = s * width
+            for col in range(ncols):
+                inverse[col].setdefault(table[row + col], []).append(s)
+
+        finals = {s for s in reachable if c.accepting[s]}
+        blocks = [b for b in (finals, reachable - finals) if b]
+        block_of = {}
+        for i, b in enumerate(blocks):
+            for s in b:
+                block_of[s] = i
+        smaller = min(range(len(blocks)), key=lambda i: len(blocks[i]))
+        pending = {(smaller, col) for col in range(ncols)} if len(blocks) > 1 else set()
+
+        while pending:
+            splitter, col = pending.pop()
+            pre = inverse[col]
+            touched = {}
+            for t in list(blocks[splitter]):
+                for s in pre.get(t, ()):
+                    touched.setdefault(block_of[s], []).append(s)
+            for b, members in touched.items():
+                if len(members) == len(blocks[b]):
+                    continue
+                new = len(blocks)
+                blocks[b].difference_update(members)
+                blocks.append(set(members))
+                for s in members:
+                    block_of[s] = new
+                for a in range(ncols):
+                    if (b, a) in pending:
+                        pending.add((new, a))
+                    else:
+                        pending.add((new if len(members) <= len(blocks[b]) else b, a))
+
+        dead_block = block_of[DEAD]
+        rep = {b: min(members) for b, members in enumerate(blocks) if b != dead_block}
+        name = {b: c.state_names[s] for b, s in rep.items()}
+        mapping = {c.state_names[s]: name[b] for s, b in block_of.items() if b != dead_block}
+        transitions = {}
+        for b, s in rep.items():
+            row = s * width
+            for col, sym in enumerate(c.symbols):
+                t = block_of[table[row + col]]
+                if t != dead_block:
+                    transitions[(name[b], sym)] = name[t]
+        finals = {name[b] for b, s in rep.items() if c.accepting[s]}
+        start = mapping.get(c.state_names[c.start])
+        if start is None:
+            # The language is empty: keep a lone non-accepting start state
+            start = c.state_names[c.start]
+            mapping = {start: start}
+        minimal = DFA(set(name.values()) | {start}, set(c.symbols), transitions, start, finals)
+        return minimal, mapping
+
+    # Boolean operations return a ProductDFA that only builds the product
+    # states reachable on the inputs it is actually run on
+    def intersection(self, other, max_states=DEFAULT_LAZY_STATES):
+        return ProductDFA([self, other], all, max_states, live=all)
+
+    def union(self, other, max_states=DEFAULT_LAZY_STATES):
+        return ProductDFA([self, other], any, max_states)
+
+    def difference(self, other, max_states=DEFAULT_LAZY_STATES):
+        # Strings accepted by self but not by other
+        return ProductDFA([self, other], _first_only, max_states, live=_first_live)
+
+    def equivalent(self, other):
+        return self.counterexample(other) is None
+
+    def counterexample(self, other):
+        # Shortest (then alphabetically first) string accepted by exactly one of
+        # self and other, or None when they accept the same language over the
+        # union of their alphabets. Equivalence is decided by Hopcroft-Karp:
+        # state pairs are merged with union-find, so the scan is near-linear in
+        # the number of states; only if the DFAs differ is the product searched
+        # breadth-first for a shortest witness.
+        a = self.compiled or self.compile()
+        b = other.compiled or other.compile()
+        if a.accepting[a.start] != b.accepting[b.start]:
+            return ''
+        # one character per class of the two alphabets' common refinement
+        labels, _ = _symbol_classes(set(a.symbols) | set(b.symbols))
+        chars = [ch for ch in map(_representative, labels) if ch is not None]
+        cols = [(a.column(ch), b.column(ch)) for ch in chars]
+        offset = a.num_states
+        parent = list(range(offset + b.num_states))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = x = parent[parent[x]]
+            return x
+
+        parent[a.start] = offset + b.start
+        pending = [(a.start, b.start)]
+        while pending:
+            p, q = pending.pop()
+            for ca, cb in cols:
+                p2 = a.table[p * a.width + ca]
+                q2 = b.table[q * b.width + cb]
+                rp, rq = find(p2), find(offset + q2)
+                if rp == rq:
+                    continue
+                if a.accepting[p2] != b.accepting[q2]:
+                    return ProductDFA([self, other], _exactly_one).shortest_accepted(
+                        max_states=a.num_states * b.num_states)
+                parent[rp] = rq
+                pending.append((p2, q2))
+        return None
+
+    def _language(self):
+        # The trimmed automaton behind the counting and enumeration methods:
+        # only states that are reachable and can still reach a final state,
+        # renumbered 0..k-1 with the start state as 0. Returns (spans, final)
+        # where spans[i] lists (lo, hi, j) character ranges leading from i to j
+        # in code point order, or None when no string is accepted.
+        c = self.compiled or self.compile()
+        table, width = c.table, c.width
+        columns = c.char_columns()
+        succ = {c.start: None}
+        order = [c.start]
+        for s in order:
+            row = s * width
+            targets = {table[row + col] for _, _, col in columns}
+            targets.discard(DEAD)
+            succ[s] = targets
+            for t in targets:
+                if t not in succ:
+                    succ[t] = None
+                    order.append(t)
+        pred = {s: [] for s in order}
+        for s in order:
+            for t in succ[s]:
+                pred[t].append(s)
+        live = {s for s in order if c.accepting[s]}
+        stack = list(live)
+        while stack:
+            for p in pred[stack.pop()]:
+                if p not in live:
+                    live.add(p)
+                    stack.append(p)
+        if c.start not in live:
+            return None
+        index = {s: i for i, s in enumerate(s for s in order if s in live)}
+        spans = [[] for _ in index]
+        for s, i in index.items():
+            row = s * width
+            for lo, hi, col in columns:
+                j = index.get(table[row + col])
+                if j is not None:
+                    spans[i].append((lo, hi, j))
+        final = [bool(c.accepting[s]) for s in index]
+        return spans, final
+
+    @staticmethod
+    def _suffix_counts(spans, final, length):
+        # counts[r][i]: accepted strings of r more characters from state i
+        counts = [[int(f) for f in final]]
+        for _ in range(length):
+            prev = counts[-1]
+            counts.append([sum((hi - lo + 1) * prev[j] for lo, hi, j in row) for row in spans])
+        return counts
+
+    def count_accepted(self, length):
+        # Exact number of accepted strings of `length` characters; a range
+        # symbol counts once per character it covers. Short lengths step a
+        # count vector through the trimmed automaton (length * edges
+        # operations); long ones raise its transition matrix to the power
+        # `length` by repeated squaring (k^3 * log2(length) for k states) in
+        # NumPy object arrays, so the counts stay Python ints of any size.
+        if length < 0:
+            raise ValueError("length must be non-negative")
+        language = self._language()
+        if language is None:
+            return 0
+        spans, final = language
+        k = len(final)
+        edges = sum(map(len, spans))
+        if length * edges <= k ** 3 * length.bit_length():
+            vec = [0] * k
+            vec[0] = 1
+            for _ in range(length):
+                nxt = [0] * k
+                for i, n in enumerate(vec):
+                    if n:
+                        for lo, hi, j in spans[i]:
+                            nxt[j] += n * (hi - lo + 1)
+                vec = nxt
+            return sum(n for n, f in zip(vec, final) if f)
+        import numpy as np
+
+        matrix = np.zeros((k, k), dtype=object)
+        for i, row in enumerate(spans):
+            for lo, hi, j in row:
+                matrix[i, j] += hi - lo + 1
+        vec = np.zeros(k, dtype=object)
+        vec[0] = 1
+        n = length
+        while n:
+            if n & 1:
+                vec = vec @ matrix
+            n >>= 1
+            if n:
+                matrix = matrix @ matrix
+        return int(sum(vec[i] for i in range(k) if final[i]))
+
+    def enumerate_accepted(self, max_length=None):
+        # Accepted strings in shortlex order (shorter first, then by code
+        # point), lazily: take the first k with itertools.islice. A branch is
+        # only entered if a final state can be reached in exactly the
+        # characters left, so no dead prefix is ever extended. Stops after
+        # max_length characters, or on its own when the language is finite.
+        language = self._language()
+        if language is None:
+            return
+        spans, final = language
+        k = len(final)
+        if _is_acyclic(spans):
+            # a finite language has no string longer than its state count
+            max_length = k - 1 if max_length is None else min(max_length, k - 1)
+        # reach[r][i]: a final state is exactly r characters away from i
+        reach = [final]
+        length = 0
+        while max_length is None or length <= max_length:
+            while len(reach) <= length:
+                prev = reach[-1]
+                reach.append([any(prev[j] for _, _, j in row) for row in spans])
+            if reach[length][0]:
+                yield from _strings_of_length(spans, reach, length)
+            length += 1
+
+    def sample_accepted(self, length, count=1, rng=None):
+        # `count` accepted strings of `length` characters, each drawn
+        # uniformly from all of them (a random rank is decoded through the
+        # suffix counts, so no string is ever rejected and redrawn). `rng` is
+        # a random.Random for reproducible samples.
+        if length < 0:
+            raise ValueError("length must be non-negative")
+        language = self._language()
+        counts = self._suffix_counts(*language, length) if language else None
+        if not counts or not counts[length][0]:
+            raise ValueError(f"No accepted string has length {length}")
+        spans = language[0]
+        rng = rng or random
+        out = []
+        for _ in range(count):
+            x = rng.randrange(counts[length][0])
+            i, chars = 0, []
+            for r in range(length, 0, -1):
+                below = counts[r - 1]
+                for lo, hi, j in spans[i]:
+                    block = below[j]
+                    if x < (hi - lo + 1) * block:
+                        chars.append(chr(lo + x // block))
+                        x %= block
+                        i = j
+                        break
+                    x -= (hi - lo + 1) * block
+            out.append(''.join(chars))
+        return out
+
+    def visualize(self, input_string, filename=None, fmt="png", heatmap=False, lod=None, hops=1,
+                  max_nodes=DEFAULT_MAX_NODES, max_edges=DEFAULT_MAX_EDGES, merge_edges=None, cache=None,
+                  cancel=None):
+        # Render DFA diagram and highlight the transitions the input takes (or,
+        # with heatmap=True, shade each edge by how often it is taken). PNGs are drawn over a layout
+        # cached by content hash, so dot only runs the first time a DFA is shown.
+        # `lod` picks what is drawn (LOD_FULL, LOD_PATH, LOD_SCC; by default
+        # full up to DEFAULT_LOD_STATES states). The reduced modes keep at most
+        # max_nodes nodes and max_edges edges, and merge parallel edges into
+        # one edge labelled with their symbols unless merge_edges is False.
+        # With a ResultCache a PNG is looked up first (a hit runs nothing) and
+        # a new one is written into the cache instead of to `filename`. Without
+        # a filename, uncached output goes to a fresh file in this process's
+        # temporary render directory, so concurrent runs never share a file.
+        # `cancel` is a threading.Event checked between stages; once it is set
+        # the call raises CancelledError.
+        key = None
+        if cache is not None and fmt == "png":
+            key = cache.key(self, input_string, heatmap=heatmap, lod=lod, hops=hops, max_nodes=max_nodes,
+                            max_edges=max_edges, merge_edges=merge_edges)
+            hit = cache.get(key) if key else None
+            if hit:
+                return hit
+        # Compute path first, so lazily built automata have discovered its states
+        with METRICS.phase('simulate'):
+            accepted, path = self.process(input_string)
+            hits = self._edge_hits(input_string)
+        _check_cancel(cancel)
+        view = self._lod_view(path, lod, hops, max_nodes, max_edges, merge_edges)
+        if filename is None and not key:
+            filename = _render_stem()
+
+        if fmt == "png":
+            with METRICS.phase('diagram'):
+                f, edges = self._diagram(filename, fmt, view=view)
+            highlight = _edge_styles(edges, hits, heatmap)
+            img_path = cache.scratch_path(key) if key else filename + ".png"
+            _check_cancel(cancel)
+            layout = DiagramLayout.for_graph(f)
+            _check_cancel(cancel)
+            with METRICS.phase('render'):
+                layout.render(img_path, highlight)
+            if key:
+                img_path = cache.put(key, accepted, path, img_path)
+            return accepted, path, img_path
+
+        with METRICS.phase('diagram'):
+            f, _ = self._diagram(filename, fmt, hits, heatmap, view)
+        _check_cancel(cancel)
+        with METRICS.phase('graphviz'):
+            output_path = f.render(view=False)
+        img_path = output_path if output_path.endswith("." + fmt) else output_path + "." + fmt
+        return accepted, path, img_path
 
-    def process(self, input_string):
-        current_state = self.start_state
-        path = [current_state]
-        for symbol in input_string:
-            if (current_state, symbol) in self.transitions:
-                current_state = self.transitions[(current_state, symbol)]
-                path.append(current_state)
-            else:
-                return False, path
-        return current_state in self.final_states, path
+    def _lod_view(self, path, lod=None, hops=1, max_nodes=DEFAULT_MAX_NODES,
+                  max_edges=DEFAULT_MAX_EDGES, merge_edges=None):
+        # The DiagramView to draw for `path`, or None for the plain full diagram
+        if lod is None:
+            lod = LOD_FULL if len(self.states) <= DEFAULT_LOD_STATES else LOD_PATH
+        if lod not in (LOD_FULL, LOD_PATH, LOD_SCC):
+            raise ValueError(f"Unknown detail mode: {lod!r}")
+        if merge_edges is None:
+            merge_edges = lod != LOD_FULL
+        if lod == LOD_FULL and not merge_edges:
+            return None
+        with METRICS.phase('lod'):
+            return DiagramView(self, path, lod, hops, max_nodes, max_edges, merge_edges)
+
+    def _diagram(self, filename="dfa", fmt="png", hits=None, heatmap=False, view=None):
+        # Canonical graphviz description (states and transitions sorted, edges
+        # with stable ids). `hits` ({(state, symbol): n}) styles the taken
+        # edges, see _edge_styles; returns the graph and {edge id: tuple of the
+        # (state, symbol) transitions it draws}. With a DiagramView only its
+        # nodes and (merged) edges are emitted.
+        import graphviz
 
-    def visualize(self, input_string, filename="dfa", fmt="png"):
-        # Render DFA diagram and highlight path
         f = graphviz.Digraph('dfa', filename=filename, format=fmt)
 
         # Start arrow (phantom node)
         f.node('', shape='none', width='0', height='0')
-        f.edge('', str(self.start_state))
+        f.edge('', str(self.start_state), id='start')
+
+        if view is not None:
+            return f, view.draw(f, hits, heatmap)
 
         # States
-        for state in self.states:
+        for state in sorted(self.states, key=str):
             shape = 'doublecircle' if state in self.final_states else 'circle'
             f.node(str(state), shape=shape)
 
-        # Compute path
-        accepted, path = self.process(input_string)
-
-        # Transitions (highlight if in path)
-        for (state, symbol), target in self.transitions.items():
-            if self._edge_in_path(state, target, path):
-                f.edge(str(state), str(target), label=symbol, color="red", penwidth="2")
+        # Transitions
+        ordered = sorted(self.transitions.items(), key=lambda kv: (str(kv[0][0]), str(kv[0][1])))
+        edges = {f"e{i}": (key,) for i, (key, _) in enumerate(ordered)}
+        styles = _edge_styles(edges, hits, heatmap) if hits else {}
+        for i, ((state, symbol), target) in enumerate(ordered):
+            eid = f"e{i}"
+            style = styles.get(eid)
+            if style:
+                f.edge(str(state), str(target), label=symbol, id=eid, color=style[0], penwidth=str(style[1]))
             else:
-                f.edge(str(state), str(target), label=symbol)
-
-        output_path = f.render(view=False)
-        # graphviz returns file path without extension sometimes; ensure .png
-        img_path = output_path if output_path.endswith(".png") else output_path + ".png"
-        return accepted, path, img_path
+                f.edge(str(state), str(target), label=symbol, id=eid)
+        return f, edges
+
+
+def _is_acyclic(spans):
+    # Kahn's algorithm over the trimmed automaton of DFA._language
+    indegree = [0] * len(spans)
+    for row in spans:
+        for j in {j for _, _, j in row}:
+            indegree[j] += 1
+    ready = [i for i, d in enumerate(indegree) if not d]
+    seen = 0
+    while ready:
+        i = ready.pop()
+        seen += 1
+        for j in {j for _, _, j in spans[i]}:
+            indegree[j] -= 1
+            if not indegree[j]:
+                ready.append(j)
+    return seen == len(spans)
+
+
+def _strings_of_length(spans, reach, length):
+    # Depth-first over the characters in code point order, with an explicit
+    # stack so long strings do not hit the recursion limit
+    def choices(i, left):
+        ok = reach[left - 1]
+        for lo, hi, j in spans[i]:
+            if ok[j]:
+                for cp in range(lo, hi + 1):
+                    yield chr(cp), j
+
+    if length == 0:
+        yield ''
+        return
+    prefix = []
+    stack = [choices(0, length)]
+    while stack:
+        step = next(stack[-1], None)
+        if step is None:
+            stack.pop()
+            if prefix:
+                prefix.pop()
+            continue
+        ch, j = step
+        prefix.append(ch)
+        if len(prefix) == length:
+            yield ''.join(prefix)
+            prefix.pop()
+        else:
+            stack.append(choices(j, length - len(prefix)))
+
+
+# --- Level of detail ---
+
+# Longest symbol list written on a merged edge
+_MAX_EDGE_SYMBOLS = 8
+
+
+def _strongly_connected(succ):
+    # Tarjan's algorithm without recursion; succ maps every node to its
+    # successors. Returns {node: component number}.
+    index, low, comp = {}, {}, {}
+    stack, on_stack = [], set()
+    counter = components = 0
+    for root in succ:
+        if root in index:
+            continue
+        work = [(root, iter(succ[root]))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            v, it = work[-1]
+            for w in it:
+                if w not in index:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(succ[w])))
+                    break
+                if w in on_stack:
+                    low[v] = min(low[v], index[w])
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack.discard(w)
+                        comp[w] = components
+                        if w == v:
+                            break
+                    components += 1
+    return comp
+
+
+def _symbols_label(symbols):
+    symbols = sorted(map(str, symbols))
+    if len(symbols) > _MAX_EDGE_SYMBOLS:
+        return ",".join(symbols[:_MAX_EDGE_SYMBOLS - 1]) + f",\u2026(+{len(symbols) - _MAX_EDGE_SYMBOLS + 1})"
+    return ",".join(symbols)
+
+
+class DiagramView:
+    # Reduced picture of a DFA around one path. States are kept as nodes or
+    # folded into summary nodes ("groups"); transitions between the same two
+    # nodes are merged. Everything is sized by the budgets, not the DFA, so
+    # dot's layout time is bounded whatever the number of states.
+    def __init__(self, dfa, path, lod, hops=1, max_nodes=DEFAULT_MAX_NODES,
+                 max_edges=DEFAULT_MAX_EDGES, merge_edges=True):
+        # LOD_FULL with merged edges draws everything; only the reduced modes have budgets
+        self.max_edges = max_edges if lod != LOD_FULL else None
+        self.merge_edges = merge_edges
+        self.finals = dfa.final_states
+        transitions = dfa.transitions
+        # States that only a transition or the path mentions are drawn too,
+        # as in the full diagram
+        states = dict.fromkeys(dfa.states)
+        for (src, _), dst in transitions.items():
+            states.setdefault(src)
+            states.setdefault(dst)
+        on_path = list(dict.fromkeys(path))
+        states.update(dict.fromkeys(on_path))
+        self.node_of = {}   # state -> node id (the state itself if shown)
+        self.groups = {}    # summary node id -> member count, finals count
+        if lod == LOD_FULL:
+            shown = sorted(states, key=str)
+        else:
+            succ = {st: set() for st in states}
+            for (src, _), dst in transitions.items():
+                succ[src].add(dst)
+            if lod == LOD_PATH:
+                shown = self._near(on_path, succ, hops)
+            else:
+                shown = self._components(on_path, succ)
+        # `shown` lists states and, as lists of members, summary nodes; each
+        # takes one node of the budget and one is kept for the rest
+        budget = max(max_nodes - 1, 1) if lod != LOD_FULL else len(shown)
+        for item in shown[:budget]:
+            if isinstance(item, list):
+                self._group(item, "SCC {first} +{more}")
+            else:
+                self.node_of.setdefault(item, item)
+        rest = [st for st in states if st not in self.node_of]
+        if rest:
+            self._group(rest, "\u2026 {n} more states")
+        self.edges = self._edges(transitions)
+
+    def _near(self, on_path, succ, hops):
+        # Path states, then states within `hops` transitions of them (either
+        # direction), nearest first
+        adj = {st: set(out) for st, out in succ.items()}
+        for st, out in succ.items():
+            for t in out:
+                adj[t].add(st)
+        seen = dict.fromkeys(on_path)
+        frontier = on_path
+        for _ in range(hops):
+            nxt = []
+            for st in frontier:
+                for t in sorted(adj[st], key=str):
+                    if t not in seen:
+                        seen[t] = None
+                        nxt.append(t)
+            frontier = nxt
+        return list(seen)
+
+    def _components(self, on_path, succ):
+        # Path states and the members of the components they are in are
+        # shown; every other component is a list of its members, to be drawn
+        # as one summary node
+        comp = _strongly_connected(succ)
+        path_comps = {comp[st] for st in on_path}
+        shown = list(on_path) + sorted((st for st in succ if comp[st] in path_comps and st not in on_path),
+                                       key=str)
+        members = {}
+        for st in sorted(succ, key=str):
+            if comp[st] not in path_comps:
+                members.setdefault(comp[st], []).append(st)
+        # biggest components first, so the budget keeps the important ones
+        for group in sorted(members.values(), key=len, reverse=True):
+            shown.append(group[0] if len(group) == 1 else group)
+        return shown
+
+    def _group(self, members, label):
+        gid = f"__group{len(self.groups)}"
+        finals = sum(1 for st in members if st in self.finals)
+        text = label.format(n=len(members), first=members[0], more=len(members) - 1)
+        if finals:
+            text += f"\n({finals} final)"
+        self.groups[gid] = text
+        for st in members:
+            self.node_of[st] = gid
+
+    def _edges(self, transitions):
+        # [(src node, dst node, symbols, [(src, sym)] or None)] in a stable
+        # order; the list holds the transitions an edge between two shown
+        # states draws. Edges inside a summary node are left out.
+        merged = {}
+        for (src, sym), dst in transitions.items():
+            a, b = self.node_of[src], self.node_of[dst]
+            if a == b and a in self.groups:
+                continue
+            shown = a == src and b == dst
+            key = (a, b) if self.merge_edges or not shown else (a, b, sym)
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = (a, b, {sym}, [(src, sym)] if shown else None)
+            else:
+                entry[2].add(sym)
+                if shown:
+                    entry[3].append((src, sym))
+        return sorted(merged.values(), key=lambda e: (str(e[0]), str(e[1]), sorted(map(str, e[2]))))
+
+    def draw(self, f, hits=None, heatmap=False):
+        # Emit nodes and edges into graphviz graph f, styling the taken ones
+        # (see _edge_styles); returns {edge id: tuple of (src, sym)}
+        for node in sorted(set(self.node_of.values()), key=str):
+            if node in self.groups:
+                f.node(node, label=self.groups[node], shape='box', style='dashed,rounded')
+            else:
+                f.node(str(node), shape='doublecircle' if node in self.finals else 'circle')
+        keep = self.edges
+        if self.max_edges is not None and len(keep) > self.max_edges:
+            # edges on the path first, then the rest in order
+            styled = [i for i, e in enumerate(keep) if hits and e[3] and any(k in hits for k in e[3])]
+            picked = set(styled[:self.max_edges])
+            for i in range(len(keep)):
+                if len(picked) >= self.max_edges:
+                    break
+                picked.add(i)
+            f.attr(label=f"{len(keep) - len(picked)} edges not shown", labelloc='b', fontsize='10')
+            keep = [e for i, e in enumerate(keep) if i in picked]
+        edges = {f"e{i}": tuple(e[3]) for i, e in enumerate(keep) if e[3] is not None}
+        styles = _edge_styles(edges, hits, heatmap) if hits else {}
+        for i, (a, b, symbols, cells) in enumerate(keep):
+            eid = f"e{i}"
+            attrs = {'label': _symbols_label(symbols), 'id': eid}
+            if cells is not None:
+                style = styles.get(eid)
+                if style:
+                    attrs.update(color=style[0], penwidth=str(style[1]))
+            else:
+                attrs['style'] = 'dashed'
+            f.edge(str(a), str(b), **attrs)
+        return edges
+
+
+# --- Diagram layout cache ---
+
+CACHE_DIR = Path(os.environ.get('DFA_CACHE_DIR') or Path.home() / '.cache' / 'dfa_playground')
+DEFAULT_LAYOUT_CACHE_BYTES = int(float(os.environ.get('DFA_LAYOUT_CACHE_MB') or 64) * (1 << 20))
+# Graphviz works in points; PNGs are rendered at its default 96 dpi with 4pt padding
+_DPI_SCALE = 96 / 72
+_PAD_PT = 4
+_HIGHLIGHT = ("#ff0000", 2)
+
+
+class DiagramLayout:
+    # Positions and drawing operations (xdot ops from `dot -Tjson`) of one
+    # graph, stored on disk under the SHA-256 of its DOT source. Rendering
+    # replays the ops with PIL: an unhighlighted base image is kept per layout
+    # and only highlighted edges are redrawn on top of a copy.
+    _bases = OrderedDict()
+    _MAX_BASES = 8
+    _stores = {}  # layout folder -> _DiskLRU
+
+    def __init__(self, data, key):
+        self.data = data
+        self.key = key
+        x0, y0, x1, y1 = (float(v) for v in data['bb'].split(','))
+        self.origin = (x0, y0)
+        self.size_pt = (x1 - x0, y1 - y0)
+        self.edges = {e.get('id'): e for e in data.get('edges', [])}
+
+    @classmethod
+    def for_graph(cls, graph, cache_dir=None):
+        key = hashlib.sha256(graph.source.encode('utf-8')).hexdigest()
+        store = cls._store(cache_dir)
+        path = store.folder / f"{key}.json"
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+            os.utime(path)
+            METRICS.count('layout.hit')
+        except (OSError, ValueError):
+            METRICS.count('layout.miss')
+            with METRICS.phase('graphviz'):
+                data = json.loads(graph.pipe(format='json'))
+            tmp = Path(store.scratch_path(key, ".json"))
+            tmp.write_text(json.dumps(data), encoding='utf-8')
+            size = tmp.stat().st_size
+            os.replace(tmp, path)
+            store._evict(size)
+        return cls(data, key)
+
+    @classmethod
+    def _store(cls, cache_dir):
+        # The layout files are an LRU like the result cache: in the reduced
+        # modes the DOT source depends on the path, so each input adds one
+        folder = Path(cache_dir or CACHE_DIR) / 'layouts'
+        store = cls._stores.get(folder)
+        if store is None:
+            store = cls._stores.setdefault(folder, _DiskLRU(folder, DEFAULT_LAYOUT_CACHE_BYTES, 'layout'))
+        return store
+
+    def render(self, out_path, highlight=()):
+        # highlight: edge ids drawn in the default highlight, or {id: (color, width)}
+        img = self.image(highlight)
+        with METRICS.phase('png_write'):
+            img.save(out_path)
+        return out_path
+
+    def image(self, highlight=()):
+        # The diagram as a PIL image, without writing it (see render)
+        _require_pil()
+        img = self._base().copy()
+        draw = ImageDraw.Draw(img)
+        styles = highlight if isinstance(highlight, dict) else dict.fromkeys(highlight, _HIGHLIGHT)
+        for eid, (color, width) in styles.items():
+            edge = self.edges.get(eid)
+            if edge is not None:
+                for ops in ('_draw_', '_hdraw_', '_tdraw_'):
+                    self._replay(draw, edge.get(ops, ()), color, width)
+        return img
+
+    def _base(self):
+        base = self._bases.get(self.key)
+        if base is not None:
+            METRICS.count('base_image.hit')
+        else:
+            METRICS.count('base_image.miss')
+            w, h = self.size_pt
+            size = (round((w + 2 * _PAD_PT) * _DPI_SCALE), round((h + 2 * _PAD_PT) * _DPI_SCALE))
+            base = Image.new("RGB", size, "white")
+            draw = ImageDraw.Draw(base)
+            for obj in self.data.get('objects', ()):
+                for ops in ('_draw_', '_ldraw_'):
+                    self._replay(draw, obj.get(ops, ()))
+            for edge in self.data.get('edges', ()):
+                for ops in ('_draw_', '_hdraw_', '_tdraw_', '_ldraw_', '_hldraw_', '_tldraw_'):
+                    self._replay(draw, edge.get(ops, ()))
+            self._bases[self.key] = base
+            while len(self._bases) > self._MAX_BASES:
+                self._bases.popitem(last=False)
+        return base
+
+    def _xy(self, pt):
+        return ((pt[0] - self.origin[0] + _PAD_PT) * _DPI_SCALE,
+                (self.size_pt[1] - (pt[1] - self.origin[1]) + _PAD_PT) * _DPI_SCALE)
+
+    def _replay(self, draw, ops, color=None, width=1):
+        # Interpret xdot drawing operations; `color` overrides pen and fill
+        pen, fill, font_size = color or "#000000", color or "#000000", 14.0
+        for op in ops:
+            kind = op.get('op')
+            if kind == 'c':
+                pen = color or op.get('color', pen)
+            elif kind == 'C':
+                fill = color or op.get('color', fill)
+            elif kind == 'F':
+                font_size = op.get('size', font_size)
+            elif kind in ('e', 'E'):
+                cx, cy, rx, ry = op['rect']
+                (x0, y0), (x1, y1) = self._xy((cx - rx, cy + ry)), self._xy((cx + rx, cy - ry))
+                draw.ellipse([x0, y0, x1, y1], outline=pen, width=width,
+                             fill=fill if kind == 'E' and fill != 'none' else None)
+            elif kind in ('p', 'P'):
+                pts = [self._xy(p) for p in op['points']]
+                draw.polygon(pts, outline=pen, fill=fill if kind == 'P' and fill != 'none' else None)
+            elif kind == 'L':
+                draw.line([self._xy(p) for p in op['points']], fill=pen, width=width)
+            elif kind in ('b', 'B'):
+                draw.line(_bezier([self._xy(p) for p in op['points']]), fill=pen, width=width)
+            elif kind == 'T':
+                anchor = {'l': 'ls', 'r': 'rs'}.get(op.get('align'), 'ms')
+                draw.text(self._xy(op['pt']), op.get('text', ''), fill=pen, anchor=anchor,
+                          font=_diagram_font(round(font_size * _DPI_SCALE)))
+
+
+def _edge_styles(edges, hits, heatmap=False):
+    # {edge id: (color, width)} for the drawn edges that were taken. `edges`
+    # maps ids to the (state, symbol) transitions they draw (several for a
+    # merged edge) and `hits` counts taken transitions, as DFA.edge_counts.
+    taken = {}
+    for eid, cells in edges.items():
+        n = sum(hits.get(cell, 0) for cell in cells)
+        if n:
+            taken[eid] = n
+    if not heatmap:
+        return dict.fromkeys(taken, _HIGHLIGHT)
+    top = max(taken.values(), default=1)
+    styles = {}
+    for eid, n in taken.items():
+        heat = n / top
+        # pale orange for rarely taken edges, saturated red for the hottest
+        styles[eid] = ("#ff%02x00" % round(200 * (1 - heat)), 1 + round(3 * heat))
+    return styles
+
+
+def _bezier(points, steps=12):
+    # Flatten a piecewise cubic Bezier (p0, c1, c2, p1, c1, c2, p2, ...) to a polyline
+    out = [points[0]]
+    for i in range(0, len(points) - 3, 3):
+        (x0, y0), (x1, y1), (x2, y2), (x3, y3) = points[i:i + 4]
+        for k in range(1, steps + 1):
+            t = k / steps
+            u = 1 - t
+            out.append((u * u * u * x0 + 3 * u * u * t * x1 + 3 * u * t * t * x2 + t * t * t * x3,
+                        u * u * u * y0 + 3 * u * u * t * y1 + 3 * u * t * t * y2 + t * t * t * y3))
+    return out
+
+
+_fonts = {}
+
+
+def _diagram_font(size):
+    font = _fonts.get(size)
+    if font is None:
+        try:
+            font = ImageFont.load_default(size=size)
+        except TypeError:
+            # Pillow < 10.1 only has the fixed-size bitmap font
+            font = ImageFont.load_default()
+        _fonts[size] = font
+    return font
+
+
+# --- Result cache ---
+
+# Bump when the entry format or the way diagrams are drawn changes
+_RESULT_CACHE_VERSION = 2
+DEFAULT_RESULT_CACHE_BYTES = int(float(os.environ.get('DFA_RESULT_CACHE_MB') or 256) * (1 << 20))
+# Temporary files older than this are left over from a crashed writer
+_STALE_TMP_SECS = 3600
+
+
+class _DiskLRU:
+    # A folder of entries, each made of files named <key>.<suffix>, kept
+    # under max_bytes: once it grows past that the entries whose newest file
+    # is oldest are deleted, so readers touch a file on a hit. Files are
+    # written under scratch_path() and renamed into place. Processes can
+    # share a folder without locks: all writes are atomic, and losing a race
+    # to another process's eviction only turns a hit into a miss. Evictions
+    # are counted as '<name>.evict'.
+    def __init__(self, folder, max_bytes, name):
+        self.folder = Path(folder)
+        self.max_bytes = max_bytes
+        self.name = name
+        self._size = None  # bytes in the folder as of the last scan plus our writes
+        self._lock = threading.Lock()
+
+    def scratch_path(self, key, suffix=".png"):
+        # A file name no other process or thread writes to, for put()
+        self.folder.mkdir(parents=True, exist_ok=True)
+        return str(self.folder / f"{key}.{os.getpid()}-{threading.get_ident()}.tmp{suffix}")
+
+    def clear(self):
+        if self.folder.is_dir():
+            for entry in os.scandir(self.folder):
+                _unlink(entry.path)
+        self._size = 0
+
+    def _evict(self, added):
+        # The folder is only scanned once our own count passes max_bytes;
+        # it is then trimmed to 3/4 of the limit so the next scan is far off
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size += added
+                if self._size <= self.max_bytes:
+                    return
+            self._size = self._trim()
 
-    def _edge_in_path(self, src, dst, path):
-        for i in range(len(path)-1):
-            if path[i] == src and path[i+1] == dst:
-                return True
-        return False
+    def _trim(self):
+        entries = {}  # key -> [last use, bytes, files]
+        total = 0
+        now = time.time()
+        for entry in os.scandir(self.folder):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if '.tmp' in entry.name:
+                if now - st.st_mtime > _STALE_TMP_SECS:
+                    _unlink(entry.path)
+                else:
+                    total += st.st_size
+                continue
+            total += st.st_size
+            e = entries.setdefault(entry.name.split('.', 1)[0], [0, 0, []])
+            e[0] = max(e[0], st.st_mtime)
+            e[1] += st.st_size
+            e[2].append(entry.path)
+        if total > self.max_bytes:
+            goal = self.max_bytes * 3 // 4
+            for _, size, files in sorted(entries.values()):
+                # the JSON goes first, so the entry stops being a hit at once
+                for f in sorted(files, key=lambda p: not p.endswith('.json')):
+                    _unlink(f)
+                total -= size
+                METRICS.count(f'{self.name}.evict')
+                if total <= goal:
+                    break
+        return total
+
+
+class ResultCache(_DiskLRU):
+    # Verdicts, paths and rendered diagrams on disk, keyed by the SHA-256 of
+    # the DFA fingerprint, the input and the drawing options. An entry is
+    # <key>.png plus <key>.json; each is written to a temporary file and
+    # renamed into place, the JSON last, so a reader never sees half an
+    # entry. Hits touch the JSON's mtime; see _DiskLRU for eviction.
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_RESULT_CACHE_BYTES):
+        super().__init__(Path(cache_dir or CACHE_DIR) / 'results', max_bytes, 'result_cache')
+
+    def key(self, dfa, input_string, **options):
+        # None for automata without a fingerprint (lazily built ones)
+        fingerprint = dfa.fingerprint()
+        if fingerprint is None:
+            return None
+        doc = json.dumps([_RESULT_CACHE_VERSION, fingerprint, input_string, options], sort_keys=True)
+        return hashlib.sha256(doc.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        # (accepted, path, image path) or None
+        meta = self.folder / f"{key}.json"
+        try:
+            entry = json.loads(meta.read_text(encoding='utf-8'))
+            img_path = self.folder / entry['image']
+            if not img_path.is_file():
+                raise FileNotFoundError(img_path)
+            os.utime(meta)
+        except (OSError, ValueError, KeyError, TypeError):
+            METRICS.count('result_cache.miss')
+            return None
+        METRICS.count('result_cache.hit')
+        return entry['accepted'], entry['path'], str(img_path)
+
+    def put(self, key, accepted, path, image_file):
+        # Move image_file (from scratch_path) into the cache; returns its new path
+        image_file = Path(image_file)
+        target = self.folder / f"{key}{image_file.suffix}"
+        size = image_file.stat().st_size
+        os.replace(image_file, target)
+        meta = json.dumps({'accepted': accepted, 'path': list(path), 'image': target.name})
+        tmp = Path(self.scratch_path(key, ".json"))
+        tmp.write_text(meta, encoding='utf-8')
+        size += tmp.stat().st_size
+        os.replace(tmp, self.folder / f"{key}.json")
+        self._evict(size)
+        return str(target)
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+# Uncached renders go to numbered files in a temporary directory of this
+# process, created on first use and removed at exit
+_render_dir = None
+_render_count = 0
+_render_lock = threading.Lock()
+
+
+def _render_stem():
+    global _render_dir, _render_count
+    with _render_lock:
+        if _render_dir is None:
+            import atexit
+            import shutil
+            import tempfile
+
+            _render_dir = tempfile.mkdtemp(prefix='dfa_renders_')
+            atexit.register(shutil.rmtree, _render_dir, True)
+        _render_count += 1
+        return os.path.join(_render_dir, f"render{_render_count}")
+
+
+def _discard_render(path):
+    # Delete an uncached render (see _render_stem) once it is no longer shown
+    if path and _render_dir and os.path.dirname(path) == _render_dir:
+        _unlink(path)
+
+
+def _leftmost_longest(text, start, step, final_of):
+    # Core of the scanners: from each position run the automaton until it dies,
+    # remembering the last accepting position (and its tag). Matches never
+    # overlap and empty matches are skipped.
+    n = len(text)
+    i = 0
+    while i < n:
+        s = start
+        j = i
+        end, tag = -1, None
+        while j < n:
+            s = step(s, text[j])
+            if s == DEAD:
+                break
+            j += 1
+            t = final_of(s)
+            if t is not None:
+                end, tag = j, t
+        if end > i:
+            yield i, end, tag
+            i = end
+        else:
+            i += 1
+
+
+# --- Regular expressions -> lazily determinized DFA ---
+
+class CharSet:
+    # Set of characters as sorted, non-overlapping (lo, hi) code point ranges
+    def __init__(self, ranges=()):
+        merged = []
+        for lo, hi in sorted(ranges):
+            if merged and lo <= merged[-1][1] + 1:
+                if hi > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], hi)
+            else:
+                merged.append((lo, hi))
+        self.ranges = tuple(merged)
+        self._starts = [lo for lo, _ in merged]
+
+    @classmethod
+    def of(cls, chars):
+        return cls((ord(ch), ord(ch)) for ch in chars)
+
+    def __contains__(self, ch):
+        i = bisect.bisect_right(self._starts, ord(ch)) - 1
+        return i >= 0 and ord(ch) <= self.ranges[i][1]
+
+    def __eq__(self, other):
+        return isinstance(other, CharSet) and self.ranges == other.ranges
+
+    def __hash__(self):
+        return hash(self.ranges)
+
+    def __len__(self):
+        return sum(hi - lo + 1 for lo, hi in self.ranges)
+
+    def __or__(self, other):
+        return CharSet(self.ranges + other.ranges)
+
+    def complement(self):
+        out, nxt = [], 0
+        for lo, hi in self.ranges:
+            if lo > nxt:
+                out.append((nxt, lo - 1))
+            nxt = hi + 1
+        if nxt <= MAX_CODE_POINT:
+            out.append((nxt, MAX_CODE_POINT))
+        return CharSet(out)
+
+    def chars(self):
+        for lo, hi in self.ranges:
+            for cp in range(lo, hi + 1):
+                yield chr(cp)
+
+    def pattern(self):
+        # Symbol syntax for this set, read back by symbol_charset: the
+        # character itself, x-y for one range, else a [...] class
+        if len(self.ranges) == 1:
+            lo, hi = self.ranges[0]
+            if lo == hi:
+                return chr(lo) if _plain_char(lo) else _escaped_char(lo)
+            if _plain_char(lo) and _plain_char(hi):
+                return f"{chr(lo)}-{chr(hi)}"
+        return "[" + "".join(_escaped_char(lo) if lo == hi else f"{_escaped_char(lo)}-{_escaped_char(hi)}"
+                             for lo, hi in self.ranges) + "]"
+
+
+def _plain_char(cp):
+    # Characters written as themselves in symbol names (the list formats
+    # split on commas, and lines must not break)
+    ch = chr(cp)
+    return ch.isprintable() and not ch.isspace() and ch not in ',\\[]-^'
+
+
+def _escaped_char(cp):
+    ch = chr(cp)
+    if _plain_char(cp):
+        return ch
+    if ch in '\\[]-^':
+        return '\\' + ch
+    if cp <= 0xFF:
+        return f"\\x{cp:02x}"
+    if cp <= 0xFFFF:
+        return f"\\u{cp:04x}"
+    return f"\\U{cp:08x}"
+
+
+ANY_CHAR = CharSet([(0, MAX_CODE_POINT)])
+_CLASS_ESCAPES = {
+    'd': CharSet([(ord('0'), ord('9'))]),
+    'w': CharSet([(ord('a'), ord('z')), (ord('A'), ord('Z')), (ord('0'), ord('9')), (ord('_'), ord('_'))]),
+    's': CharSet.of(' \t\n\r\f\v'),
+}
+_CHAR_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v', '0': '\0'}
+# \xHH, \uHHHH and \UHHHHHHHH code point escapes
+_HEX_ESCAPES = {'x': 2, 'u': 4, 'U': 8}
+_MAX_REPEAT = 1000
+_categories = None
+
+
+def _unicode_category(name):
+    # CharSet of a general category (Lu, Nd, ...) or major class (L, N, ...);
+    # the table is built from unicodedata on first use
+    global _categories
+    if _categories is None:
+        import unicodedata
+
+        ranges = {}
+        last, start = None, 0
+        for cp in range(MAX_CODE_POINT + 2):
+            cat = unicodedata.category(chr(cp)) if cp <= MAX_CODE_POINT else None
+            if cat != last:
+                if last is not None:
+                    ranges.setdefault(last, []).append((start, cp - 1))
+                last, start = cat, cp
+        _categories = {cat: CharSet(r) for cat, r in ranges.items()}
+        for major in {cat[0] for cat in ranges}:
+            _categories[major] = CharSet([r for cat, cs in _categories.items()
+                                          if cat[0] == major and len(cat) == 2 for r in cs.ranges])
+    return _categories.get(name)
+
+
+class _RegexParser:
+    # Recursive descent parser producing a small AST of tuples:
+    # ('set', CharSet) | ('cat', [nodes]) | ('alt', [nodes]) | ('star', node) | ('opt', node)
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.i = 0
+
+    def error(self, msg):
+        return ValueError(f"Invalid regex at position {self.i}: {msg}")
+
+    def peek(self):
+        return self.pattern[self.i] if self.i < len(self.pattern) else None
+
+    def take(self):
+        ch = self.peek()
+        if ch is None:
+            raise self.error("unexpected end of pattern")
+        self.i += 1
+        return ch
+
+    def parse(self):
+        node = self.alternation()
+        if self.i != len(self.pattern):
+            raise self.error("unbalanced ')'")
+        return node
+
+    def alternation(self):
+        branches = [self.concatenation()]
+        while self.peek() == '|':
+            self.i += 1
+            branches.append(self.concatenation())
+        return branches[0] if len(branches) == 1 else ('alt', branches)
+
+    def concatenation(self):
+        items = []
+        while self.peek() is not None and self.peek() not in '|)':
+            items.append(self.repetition())
+        return items[0] if len(items) == 1 else ('cat', items)
+
+    def repetition(self):
+        node = self.atom()
+        while True:
+            ch = self.peek()
+            if ch == '*':
+                self.i += 1
+                node = ('star', node)
+            elif ch == '+':
+                self.i += 1
+                node = ('cat', [node, ('star', node)])
+            elif ch == '?':
+                self.i += 1
+                node = ('opt', node)
+            elif ch == '{' and (bounds := self._bounds()) is not None:
+                lo, hi = bounds
+                node = ('cat', [node] * lo + ([('star', node)] if hi is None else [('opt', node)] * (hi - lo)))
+            else:
+                return node
+            if self.peek() == '?':
+                # Lazy quantifiers match the same language
+                self.i += 1
+
+    def _bounds(self):
+        # Parse {m}, {m,} or {m,n} at the cursor; returns None (cursor untouched)
+        # when the brace is not a quantifier and should be read literally
+        end = self.pattern.find('}', self.i)
+        if end < 0:
+            return None
+        body = self.pattern[self.i + 1:end]
+        lo, sep, hi = body.partition(',')
+        if not lo.isdigit() or (hi and not hi.isdigit()):
+            return None
+        lo = int(lo)
+        hi = None if sep and not hi else int(hi) if hi else lo
+        if hi is not None and hi < lo or max(lo, hi or 0) > _MAX_REPEAT:
+            raise self.error(f"bad repetition {{{body}}}")
+        self.i = end + 1
+        return lo, hi
+
+    def atom(self):
+        ch = self.take()
+        if ch == '(':
+            if self.pattern.startswith('?:', self.i):
+                self.i += 2
+            node = self.alternation()
+            if self.take() != ')':
+                raise self.error("missing ')'")
+            return node
+        if ch == '[':
+            return ('set', self.char_class())
+        if ch == '.':
+            return ('set', ANY_CHAR)
+        if ch == '\\':
+            return ('set', self.escape())
+        if ch in '*+?':
+            raise self.error("nothing to repeat")
+        if ch == ')':
+            raise self.error("unbalanced ')'")
+        if ch in '^$':
+            raise self.error("anchors are implicit: patterns always match the whole input")
+        return ('set', CharSet.of(ch))
+
+    def escape(self):
+        ch = self.take()
+        if ch.lower() in _CLASS_ESCAPES:
+            cs = _CLASS_ESCAPES[ch.lower()]
+            return cs.complement() if ch.isupper() else cs
+        if ch in 'pP':
+            # \p{Lu}, \p{L} or \pL: Unicode general category (or major class)
+            if self.peek() == '{':
+                end = self.pattern.find('}', self.i)
+                if end < 0:
+                    raise self.error("missing '}'")
+                name, self.i = self.pattern[self.i + 1:end], end + 1
+            else:
+                name = self.take()
+            cs = _unicode_category(name)
+            if cs is None:
+                raise self.error(f"unknown Unicode category {name!r}")
+            return cs.complement() if ch == 'P' else cs
+        if ch in _HEX_ESCAPES:
+            digits = self.pattern[self.i:self.i + _HEX_ESCAPES[ch]]
+            if len(digits) != _HEX_ESCAPES[ch] or not all(d in string.hexdigits for d in digits):
+                raise self.error(f"bad \\{ch} escape")
+            self.i += len(digits)
+            cp = int(digits, 16)
+            if cp > MAX_CODE_POINT:
+                raise self.error(f"bad \\{ch} escape")
+            return CharSet([(cp, cp)])
+        return CharSet.of(_CHAR_ESCAPES.get(ch, ch))
+
+    def char_class(self):
+        negate = self.peek() == '^'
+        if negate:
+            self.i += 1
+        ranges = CharSet()
+        first = True
+        while True:
+            ch = self.take()
+            if ch == ']' and not first:
+                break
+            first = False
+            if ch == '\\':
+                item = self.escape()
+                if len(item.ranges) != 1 or item.ranges[0][0] != item.ranges[0][1]:
+                    ranges = ranges | item
+                    continue
+                lo = item.ranges[0][0]
+            else:
+                lo = ord(ch)
+            if self.peek() == '-' and self.pattern[self.i + 1:self.i + 2] not in ('', ']'):
+                self.i += 1
+                end = self.take()
+                hi = self.escape().ranges[0][0] if end == '\\' else ord(end)
+                if hi < lo:
+                    raise self.error("bad character range")
+                ranges = ranges | CharSet([(lo, hi)])
+            else:
+                ranges = ranges | CharSet([(lo, lo)])
+        return ranges.complement() if negate else ranges
+
+
+# --- Symbol classes ---
+
+_symbol_sets = {}
+# Characters outside Latin-1 whose column was looked up are remembered, up to this many
+_MAX_CACHED_COLUMNS = 1 << 16
+
+
+def symbol_charset(symbol):
+    # CharSet named by a range symbol: x-y, a class escape (\d, \w, \s,
+    # \p{L}, ...) or a [...] class. Returns None for plain symbols; a single
+    # character is always plain. Raises ValueError for a malformed range.
+    if not isinstance(symbol, str) or len(symbol) < 2:
+        return None
+    cs = _symbol_sets.get(symbol)
+    if cs is None:
+        if len(symbol) == 3 and symbol[1] == '-':
+            lo, hi = ord(symbol[0]), ord(symbol[2])
+            if hi < lo:
+                raise ValueError(f"Invalid symbol {symbol!r}: bad character range")
+            cs = CharSet([(lo, hi)])
+        elif symbol[0] in '\\[':
+            parser = _RegexParser(symbol)
+            try:
+                parser.i = 1
+                cs = parser.escape() if symbol[0] == '\\' else parser.char_class()
+                if parser.i != len(symbol):
+                    raise parser.error("unexpected characters after the range")
+            except ValueError as e:
+                raise ValueError(f"Invalid symbol {symbol!r}: {e}") from None
+        else:
+            cs = False  # plain multi-character symbol
+        _symbol_sets[symbol] = cs
+    return cs or None
+
+
+def is_range_symbol(symbol):
+    return symbol_charset(symbol) is not None
+
+
+def _representative(symbol):
+    # A character standing for `symbol` in a search, or None for plain
+    # multi-character symbols (input is read one character at a time)
+    if isinstance(symbol, str) and len(symbol) == 1:
+        return symbol
+    cs = symbol_charset(symbol)
+    return chr(cs.ranges[0][0]) if cs else None
+
+
+def _symbol_classes(symbols):
+    # Split the characters named by `symbols` (plain characters and range
+    # symbols) into equivalence classes: maximal sets of characters that no
+    # symbol tells apart. Returns (labels, cover): one label per class, in
+    # code point order, followed by the plain multi-character symbols, and
+    # {symbol: [class numbers]}. A class equal to a symbol is labelled with
+    # it, other classes with CharSet.pattern().
+    sets, plain = {}, []
+    for sym in symbols:
+        cs = symbol_charset(sym)
+        if cs is None and isinstance(sym, str) and len(sym) == 1:
+            cs = CharSet.of(sym)
+        if cs is None:
+            plain.append(sym)
+        elif cs.ranges:
+            sets[sym] = cs
+    events = {}
+    for sym, cs in sets.items():
+        for lo, hi in cs.ranges:
+            events.setdefault(lo, []).append((True, sym))
+            events.setdefault(hi + 1, []).append((False, sym))
+    # sweep over the range boundaries; every segment between two of them is
+    # covered by one set of symbols, and equal sets form a class
+    points = sorted(events)
+    active = set()
+    class_of = {}
+    ranges = []
+    for p, nxt in zip(points, points[1:]):
+        for start, sym in events[p]:
+            if start:
+                active.add(sym)
+            else:
+                active.discard(sym)
+        if active:
+            key = frozenset(active)
+            k = class_of.get(key)
+            if k is None:
+                k = class_of[key] = len(ranges)
+                ranges.append([])
+            ranges[k].append((p, nxt - 1))
+    named = {}
+    for sym, cs in sorted(sets.items(), key=lambda kv: str(kv[0])):
+        named.setdefault(cs, sym)
+    labels = []
+    for r in ranges:
+        cs = CharSet(r)
+        labels.append(named.get(cs) or cs.pattern())
+    cover = {sym: [] for sym in sets}
+    for key, k in class_of.items():
+        for sym in key:
+            cover[sym].append(k)
+    for sym in sorted(plain, key=str):
+        cover[sym] = [len(labels)]
+        labels.append(sym)
+    return labels, cover
+
+
+class _Columns(dict):
+    # symbol -> column of a compiled table. Plain symbols are keys; characters
+    # of range columns are found by bisecting the range bounds on first use
+    # and then kept (Latin-1 is filled in up front, the byte-class map of the
+    # hot loops). Anything else gets the unknown column, so the walks can
+    # index with cols[ch] instead of cols.get(ch, unknown).
+    def __init__(self, symbols):
+        super().__init__((sym, col) for col, sym in enumerate(symbols))
+        self.unknown = len(symbols)
+        bounds = sorted((lo, hi, col) for col, sym in enumerate(symbols)
+                        if (cs := symbol_charset(sym)) is not None for lo, hi in cs.ranges)
+        self._bounds = bounds
+        self._starts = [lo for lo, _, _ in bounds]
+        if bounds:
+            for b in range(256):
+                self.setdefault(chr(b), self._lookup(b))
+
+    def _lookup(self, cp):
+        i = bisect.bisect_right(self._starts, cp) - 1
+        if i >= 0 and cp <= self._bounds[i][1]:
+            return self._bounds[i][2]
+        return self.unknown
+
+    def __missing__(self, symbol):
+        if not self._bounds or not isinstance(symbol, str) or len(symbol) != 1:
+            return self.unknown
+        col = self._lookup(ord(symbol))
+        if len(self) < _MAX_CACHED_COLUMNS:
+            self[symbol] = col
+        return col
+
+    def ranges(self):
+        # (lo, hi, column) for the range columns, sorted by code point
+        return self._bounds
+
+
+class NFA:
+    # Thompson NFA. Every state has a list of successors in `out`: CHAR states
+    # consume one character from sets[i], SPLIT states are epsilon fan-outs and
+    # the single MATCH state accepts.
+    CHAR, SPLIT, MATCH = 0, 1, 2
+
+    def __init__(self):
+        self.kind = []
+        self.sets = []
+        self.out = []
+        self.start = None
+        self.match = None
+
+    @classmethod
+    def from_regex(cls, pattern):
+        nfa = cls()
+        nfa.start, dangling = nfa._build(_RegexParser(pattern).parse())
+        nfa.match = nfa._add(cls.MATCH, None, [])
+        nfa._patch(dangling, nfa.match)
+        return nfa
+
+    def _add(self, kind, charset, out):
+        self.kind.append(kind)
+        self.sets.append(charset)
+        self.out.append(out)
+        return len(self.kind) - 1
+
+    def _patch(self, dangling, target):
+        for state, slot in dangling:
+            self.out[state][slot] = target
+
+    def _build(self, node):
+        # Returns (start state, [(state, slot)] successor slots still to be filled)
+        op = node[0]
+        if op == 'set':
+            s = self._add(self.CHAR, node[1], [None])
+            return s, [(s, 0)]
+        if op == 'cat':
+            if not node[1]:
+                s = self._add(self.SPLIT, None, [None])
+                return s, [(s, 0)]
+            start, dangling = self._build(node[1][0])
+            for item in node[1][1:]:
+                s, d = self._build(item)
+                self._patch(dangling, s)
+                dangling = d
+            return start, dangling
+        if op == 'alt':
+            built = [self._build(b) for b in node[1]]
+            s = self._add(self.SPLIT, None, [b for b, _ in built])
+            return s, [slot for _, d in built for slot in d]
+        body, dangling = self._build(node[1])
+        s = self._add(self.SPLIT, None, [body, None])
+        if op == 'star':
+            self._patch(dangling, s)
+            return s, [(s, 1)]
+        return s, dangling + [(s, 1)]
+
+    def closure(self, states):
+        # Epsilon closure, keeping only CHAR and MATCH states
+        kind, out = self.kind, self.out
+        seen, stack, result = set(), list(states), []
+        while stack:
+            s = stack.pop()
+            if s in seen:
+                continue
+            seen.add(s)
+            if kind[s] == self.SPLIT:
+                stack.extend(out[s])
+            else:
+                result.append(s)
+        return frozenset(result)
+
+    def step(self, key, ch):
+        kind, sets, out = self.kind, self.sets, self.out
+        targets = [out[s][0] for s in key if kind[s] == self.CHAR and ch in sets[s]]
+        return self.closure(targets) if targets else None
+
+
+class LazyDFA(DFA):
+    # DFA whose states are discovered on demand while input is consumed.
+    # Subclasses define _initial_key(), _next_key(key, symbol) (None = dead) and
+    # _is_final(key). Discovered states are kept in a cache of at most
+    # max_states entries that is flushed wholesale when full, as RE2 does;
+    # state ids are never reused (the start state always keeps id 1), so
+    # reported names stay unambiguous.
+    def __init__(self, max_states=DEFAULT_LAZY_STATES):
+        self.max_states = max_states
+        self.compiled = None
+        self.flushes = 0
+        self._counter = DEAD
+        self._flush()
+
+    def fingerprint(self):
+        # The drawn states depend on what has been discovered, so runs of a
+        # lazy automaton are not cached
+        return None
+
+    def clone(self):
+        # Same automaton with its own, empty state cache. The cache is not
+        # thread-safe, so each thread that steps the automaton needs a clone;
+        # the definition (NFA, component tables) is read-only and shared.
+        dup = copy.copy(self)
+        dup.flushes = 0
+        dup._counter = DEAD
+        dup._flush()
+        return dup
+
+    def _flush(self):
+        self._ids = {}
+        self._keys = {}
+        self._rows = {}
+        self._final = set()
+        self._start = self._intern(self._initial_key(), 1)
+
+    def _intern(self, key, i=None):
+        if key in self._ids:
+            return self._ids[key]
+        if i is None:
+            self._counter += 1
+            i = self._counter
+        else:
+            self._counter = max(self._counter, i)
+        self._ids[key] = i
+        self._keys[i] = key
+        self._rows[i] = {}
+        if self._is_final(key):
+            self._final.add(i)
+        return i
+
+    def _expand(self, s, symbol):
+        # Transition cache miss: compute the successor and remember it
+        METRICS.count('lazy.expand')
+        key = self._next_key(self._keys[s], symbol)
+        if key is None:
+            t = DEAD
+        else:
+            t = self._ids.get(key)
+            if t is None:
+                if len(self._rows) >= self.max_states:
+                    self.flushes += 1
+                    METRICS.count('lazy.flush')
+                    self._flush()
+                t = self._intern(key)
+        row = self._rows.get(s)
+        if row is not None:
+            row[symbol] = t
+        return t
+
+    @staticmethod
+    def _name(i):
+        return f"d{i}"
+
+    def process(self, input_string, trace=TRACE_PATH, ring_size=DEFAULT_RING_SIZE):
+        # Same trace modes as DFA.process; 'array' holds lazy state ids and
+        # 'counts' is a Counter of {(state name, character): hits}, as the
+        # lazy states have no table cells to index
+        if trace == TRACE_COUNTS:
+            return self._count_edges(input_string)
+        if trace not in (TRACE_PATH, TRACE_ARRAY, TRACE_RING, TRACE_NONE):
+            raise ValueError(f"Unknown trace mode: {trace!r}")
+        s = self._start
+        rows = self._rows
+        states = deque([s], maxlen=ring_size) if trace == TRACE_RING else array('I', [s])
+        record = states.append if trace != TRACE_NONE else None
+        accepted = False
+        for ch in input_string:
+            t = rows[s].get(ch)
+            if t is None:
+                t = self._expand(s, ch)
+                rows = self._rows
+            if t == DEAD:
+                break
+            s = t
+            if record:
+                record(s)
+        else:
+            accepted = s in self._final
+        if METRICS.enabled and trace in (TRACE_PATH, TRACE_ARRAY):
+            METRICS.count('steps', len(states) - 1)
+        if trace == TRACE_NONE:
+            return accepted, None
+        if trace == TRACE_ARRAY:
+            return accepted, states
+        names = [self._name(i) for i in states]
+        return accepted, deque(names, maxlen=ring_size) if trace == TRACE_RING else names
+
+    def _count_edges(self, input_string):
+        counts = Counter()
+        s = self._start
+        accepted = False
+        for ch in input_string:
+            t = self._rows[s].get(ch)
+            if t is None:
+                t = self._expand(s, ch)
+            if t == DEAD:
+                break
+            counts[s, ch] += 1
+            s = t
+        else:
+            accepted = s in self._final
+        # ids are never reused, so naming them after a flush is still unambiguous
+        return accepted, Counter({(self._name(s), ch): n for (s, ch), n in counts.items()})
+
+    def edge_counts(self, counts):
+        # A lazy 'counts' trace is already keyed by (state, symbol)
+        return dict(counts)
+
+    def _extend_path(self, text, path):
+        # As DFA._extend_path over the lazy cache. After a flush the earlier ids
+        # on the path are stale; callers compare `flushes` to notice.
+        done = len(path) - 1
+        s = path[-1]
+        rows = self._rows
+        accepted = False
+        for ch in text[done:]:
+            t = rows[s].get(ch)
+            if t is None:
+                t = self._expand(s, ch)
+                rows = self._rows
+            if t == DEAD:
+                break
+            s = t
+            path.append(s)
+        else:
+            accepted = s in self._final
+        if METRICS.enabled:
+            METRICS.count('steps', len(path) - 1 - done)
+        return accepted
+
+    def _stepper(self):
+        # The cache may be flushed mid-scan, so always look it up through self
+        def step(s, ch):
+            t = self._rows[s].get(ch)
+            return self._expand(s, ch) if t is None else t
+
+        def final_of(s):
+            return True if s in self._final else None
+
+        return self._start, step, final_of
+
+    # DFA interface over the states discovered so far
+    @property
+    def states(self):
+        return {self._name(i) for i in self._rows}
+
+    @property
+    def alphabet(self):
+        return {sym for row in self._rows.values() for sym in row}
+
+    @property
+    def transitions(self):
+        return {(self._name(s), sym): self._name(t)
+                for s, row in self._rows.items() for sym, t in row.items() if t != DEAD}
+
+    @property
+    def start_state(self):
+        return self._name(self._start)
+
+    @property
+    def final_states(self):
+        return {self._name(i) for i in self._final}
+
+    def _default_alphabet(self):
+        return self.alphabet
+
+    def materialize(self, alphabet=None, max_states=DEFAULT_LAZY_STATES):
+        # Eagerly explore every state reachable over `alphabet` (default: the
+        # character classes the automaton tells apart) and return a plain DFA
+        symbols = sorted(alphabet if alphabet is not None else self._default_alphabet())
+        start = self._initial_key()
+        names = {start: "q0"}
+        queue = [start]
+        transitions = {}
+        for key in queue:
+            for sym in symbols:
+                nxt = self._next_key(key, sym)
+                if nxt is None:
+                    continue
+                if nxt not in names:
+                    if len(names) >= max_states:
+                        raise ValueError(f"DFA has more than {max_states} states; use the lazy form")
+                    names[nxt] = f"q{len(names)}"
+                    queue.append(nxt)
+                transitions[(names[key], sym)] = names[nxt]
+        finals = {name for key, name in names.items() if self._is_final(key)}
+        return DFA(set(names.values()), set(symbols), transitions, "q0", finals)
+
+    def compile(self):
+        # Table-driven APIs run on the materialized automaton
+        self.compiled = self.materialize().compile()
+        return self.compiled
+
+    def shortest_accepted(self, alphabet=None, max_states=DEFAULT_LAZY_STATES):
+        # Breadth-first search from the start state over `alphabet` (default:
+        # as in materialize); returns the shortest, then alphabetically first,
+        # accepted string, or None if no string over the alphabet is accepted
+        symbols = alphabet if alphabet is not None else self._default_alphabet()
+        symbols = sorted((sym for sym in symbols if _representative(sym) is not None), key=_representative)
+        start = self._initial_key()
+        back = {start: None}
+        queue = deque([start])
+        while queue:
+            key = queue.popleft()
+            if self._is_final(key):
+                out = []
+                while back[key] is not None:
+                    key, sym = back[key]
+                    out.append(_representative(sym))
+                return ''.join(reversed(out))
+            for sym in symbols:
+                nxt = self._next_key(key, sym)
+                if nxt is not None and nxt not in back:
+                    if len(back) >= max_states:
+                        raise ValueError(f"Search exceeded {max_states} states")
+                    back[nxt] = (key, sym)
+                    queue.append(nxt)
+        return None
+
+
+def _first_only(flags):
+    a, b = flags
+    return a and not b
+
+
+def _first_live(key):
+    return key[0] != DEAD
+
+
+def _exactly_one(flags):
+    a, b = flags
+    return a != b
+
+
+class RegexDFA(LazyDFA):
+    # Regular expression matched against the whole input through a Thompson
+    # NFA that is determinized lazily. Supports literals, ., [...] classes,
+    # \d \w \s (and negations), grouping, |, *, +, ? and {m,n}.
+    def __init__(self, pattern, max_states=DEFAULT_LAZY_STATES):
+        self.pattern = pattern
+        self.nfa = NFA.from_regex(pattern)
+        super().__init__(max_states)
+
+    def _initial_key(self):
+        return self.nfa.closure([self.nfa.start])
+
+    def _next_key(self, key, symbol):
+        # `symbol` is an input character or, from materialize(), a class label
+        if len(symbol) != 1:
+            symbol = _representative(symbol)
+        return self.nfa.step(key, symbol)
+
+    def _is_final(self, key):
+        return self.nfa.match in key
+
+    def _default_alphabet(self):
+        # One class label per set of characters the pattern cannot tell apart,
+        # so wide sets (., [^a], \D) become ranges over every code point they
+        # cover; characters outside all sets fall in the table's unknown column
+        sets = {cs.pattern() for kind, cs in zip(self.nfa.kind, self.nfa.sets)
+                if kind == NFA.CHAR and cs.ranges}
+        labels, _ = _symbol_classes(sets)
+        return set(labels)
+
+
+class ProductDFA(LazyDFA):
+    # Product of several DFAs whose states (tuples of component states) are
+    # built on demand. `accept` maps the tuple of component acceptances to the
+    # product's; the default, any, gives the union. `live` gets the tuple of
+    # component states (DEAD is 0, so any/all apply directly) and decides
+    # whether the product can still accept; when it cannot, the product is
+    # dead. The default, any, is only wrong for an `accept` that holds when
+    # every component has died.
+    def __init__(self, dfas, accept=any, max_states=DEFAULT_LAZY_STATES, live=any):
+        self.components = [d.compiled or d.compile() for d in dfas]
+        self.accept = accept
+        self.live = live
+        self._tags = {}
+        super().__init__(max_states)
+
+    def _flush(self):
+        self._tags = {}
+        super()._flush()
+
+    def _initial_key(self):
+        return tuple(c.start for c in self.components)
+
+    def _next_key(self, key, symbol):
+        # `symbol` is an input character or, from materialize(), a class label
+        if len(symbol) != 1:
+            symbol = _representative(symbol)
+        nxt = tuple(c.table[s * c.width + c.column(symbol)] for c, s in zip(self.components, key))
+        return nxt if self.live(nxt) else None
+
+    def _is_final(self, key):
+        return self.accept(bool(c.accepting[s]) for c, s in zip(self.components, key))
+
+    def _default_alphabet(self):
+        # classes of the components' common refinement (ranges stay ranges)
+        labels, _ = _symbol_classes({sym for c in self.components for sym in c.symbols})
+        return {sym for sym in labels if _representative(sym) is not None}
+
+    def first_accepting(self, sid):
+        # Index of the first component accepting in product state `sid`, or None
+        tag = self._tags.get(sid, -1)
+        if tag == -1:
+            key = self._keys[sid]
+            tag = next((i for i, (c, s) in enumerate(zip(self.components, key)) if c.accepting[s]), None)
+            self._tags[sid] = tag
+        return tag
+
+
+class Scanner:
+    # Finds leftmost-longest matches of several automata in a single pass over
+    # the text through their lazily built product. When patterns tie on the
+    # longest match, the earliest pattern wins (as in lex).
+    def __init__(self, dfas, max_states=DEFAULT_LAZY_STATES):
+        self.dfas = list(dfas)
+        self.product = ProductDFA(self.dfas, max_states=max_states)
+
+    def finditer(self, text):
+        # Yield (start, end, pattern index) for every match
+        start, step, _ = self.product._stepper()
+        return _leftmost_longest(text, start, step, self.product.first_accepting)
+
+    def counts(self, text):
+        counts = [0] * len(self.dfas)
+        for _, _, tag in self.finditer(text):
+            counts[tag] += 1
+        return counts
+
+
+# --- Incremental evaluation ---
+
+def _common_prefix_len(a, b):
+    # Length of the longest common prefix, compared in C by halving slices
+    if b.startswith(a):
+        return len(a)
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class PrefixCache:
+    # Acceptance for an input that is edited at the end, as in a text entry.
+    # The states along the last input are kept, so appending or deleting a
+    # character steps only over the changed tail; verdicts for up to maxsize
+    # earlier inputs are kept in an LRU for when an edit is undone.
+    def __init__(self, dfa, maxsize=1024):
+        self.dfa = dfa
+        self.maxsize = maxsize
+        self._verdicts = OrderedDict()
+        self._reset()
+
+    def _reset(self):
+        self._flushes = getattr(self.dfa, 'flushes', 0)
+        self._text = ''
+        self._path = [self.dfa._stepper()[0]]
+
+    def accepts(self, text):
+        verdict = self._verdicts.get(text)
+        if verdict is not None:
+            METRICS.count('prefix.hit')
+            self._verdicts.move_to_end(text)
+            return verdict
+        METRICS.count('prefix.miss')
+        path = self._path
+        del path[_common_prefix_len(self._text, text) + 1:]
+        verdict = self.dfa._extend_path(text, path)
+        self._text = text
+        if getattr(self.dfa, 'flushes', 0) != self._flushes:
+            self._reset()
+        self._verdicts[text] = verdict
+        if len(self._verdicts) > self.maxsize:
+            self._verdicts.popitem(last=False)
+        return verdict
+
+
+# --- Loading and saving ---
+
+def _split_list(value):
+    return set(v.strip() for v in value.split(',') if v.strip())
+
+
+def _check_symbols(alphabet, transitions):
+    # Parse range symbols up front so a malformed one fails the load, not the
+    # first process() call
+    for sym in set(alphabet).union(sym for (_, sym) in transitions):
+        symbol_charset(sym)
+
+
+def parse_dfa_text(text):
+    # Parse the TXT format: "states:", "alphabet:", "start:", "finals:" lines,
+    # then "transitions:" followed by one src,sym->dst line per transition.
+    # `text` may be a string or any iterable of lines (e.g. an open file).
+    lines = text.splitlines() if isinstance(text, str) else text
+    data = {'states': '', 'alphabet': '', 'start': '', 'finals': ''}
+    transitions = {}
+    mode = None
+    for ln in lines:
+        ln = ln.strip()
+        if not ln:
+            continue
+        # keywords are short, so only the head of the line needs lowering
+        low = ln[:13].lower()
+        if low.startswith('states:'):
+            data['states'] = ln.split(':', 1)[1].strip()
+        elif low.startswith('alphabet:'):
+            data['alphabet'] = ln.split(':', 1)[1].strip()
+        elif low.startswith('start:'):
+            data['start'] = ln.split(':', 1)[1].strip()
+        elif low.startswith('finals:') or low.startswith('final states:'):
+            data['finals'] = ln.split(':', 1)[1].strip()
+        elif low.startswith('transitions:'):
+            mode = 'transitions'
+        elif mode == 'transitions':
+            left, arrow, dst = ln.partition('->')
+            src, comma, sym = left.partition(',')
+            if arrow and comma:
+                transitions[(src.strip(), sym.strip())] = dst.strip()
+    if not data['states'] or not data['alphabet'] or not data['start']:
+        raise ValueError('File missing required DFA fields (states, alphabet, start)')
+    alphabet = _split_list(data['alphabet'])
+    _check_symbols(alphabet, transitions)
+    return DFA(_split_list(data['states']), alphabet, transitions,
+               data['start'], _split_list(data['finals']))
+
+
+def dfa_to_text(dfa):
+    # Inverse of parse_dfa_text (states and transitions in sorted order)
+    lines = [
+        f"states: {','.join(sorted(map(str, dfa.states)))}",
+        f"alphabet: {','.join(sorted(map(str, dfa.alphabet)))}",
+        f"start: {dfa.start_state}",
+        f"finals: {','.join(sorted(map(str, dfa.final_states)))}",
+        "transitions:",
+    ]
+    lines.extend(f"{src},{sym}->{dst}" for (src, sym), dst in
+                 sorted(dfa.transitions.items(), key=lambda kv: (str(kv[0][0]), str(kv[0][1]))))
+    return "\n".join(lines) + "\n"
+
+
+def dfa_from_dict(data):
+    # Build a DFA from the JSON export structure (see assets/dfa.json)
+    if not isinstance(data, dict):
+        raise ValueError("Invalid DFA JSON: expected an object")
+    missing = [k for k in ('states', 'alphabet', 'start') if not data.get(k)]
+    if missing:
+        raise ValueError(f"JSON missing required DFA fields ({', '.join(missing)})")
+    for key in ('states', 'alphabet', 'finals'):
+        names = data.get(key, ())
+        if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+            raise ValueError(f"Invalid DFA JSON: '{key}' must be a list of strings")
+    if not isinstance(data['start'], str):
+        raise ValueError("Invalid DFA JSON: 'start' must be a string")
+    transitions = data.get('transitions', ())
+    if not isinstance(transitions, dict):
+        if not isinstance(transitions, list):
+            raise ValueError("Invalid DFA JSON: 'transitions' must be a list")
+        transitions = dict(_json_transition(t) for t in transitions)
+    _check_symbols(data['alphabet'], transitions)
+    return DFA(set(data['states']), set(data['alphabet']), transitions,
+               data['start'], set(data.get('finals', ())))
+
+
+def _json_transition(t):
+    # ((src, sym), dst) of one {"src", "sym", "dst"} transition entry
+    if not isinstance(t, dict) or not all(isinstance(t.get(k), str) for k in ('src', 'sym', 'dst')):
+        raise ValueError(f"Invalid DFA JSON: bad transition {t!r}, "
+                         "expected an object with string 'src', 'sym' and 'dst'")
+    return (t['src'], t['sym']), t['dst']
+
+
+class _JSONStream:
+    # Incremental reader for one JSON document. Values are decoded with
+    # JSONDecoder.raw_decode from a buffer that is refilled from the file;
+    # reads grow with the buffer so a large value is not re-parsed too often.
+    _ws = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, fh, chunk_size=1 << 16):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.fh.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = self._ws.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise ValueError(f"Invalid DFA JSON: expected {ch!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                val, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a number cut at the buffer end would decode short: read on
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return val
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise ValueError("Invalid DFA JSON") from None
+            self._fill()
+
+    def items(self):
+        # Iterate the (key, value stream) pairs of the top-level object; the
+        # consumer must read each value (value() or array()) before the next key
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            sep = self.peek()
+            self.pos += 1
+            if sep == '}':
+                return
+            if sep != ',':
+                raise ValueError("Invalid DFA JSON: expected ',' or '}'")
+
+    def array(self):
+        # Yield the elements of an array one at a time
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            sep = self.peek()
+            self.pos += 1
+            if sep == ']':
+                return
+            if sep != ',':
+                raise ValueError("Invalid DFA JSON: expected ',' or ']'")
+
+
+def load_dfa_json(fh):
+    # Streaming loader for the JSON structure: transitions are inserted one
+    # element at a time instead of materializing the whole document first
+    stream = _JSONStream(fh)
+    data = {}
+    for key in stream.items():
+        if key == 'transitions':
+            transitions = data['transitions'] = {}
+            for t in stream.array():
+                key, dst = _json_transition(t)
+                transitions[key] = dst
+        else:
+            data[key] = stream.value()
+    return dfa_from_dict(data)
+
+
+# Binary format: little-endian header, JSON name tables, one accepting byte per
+# state and the int32 transition table (8-byte aligned, mmapped on load)
+_BINARY_MAGIC = b'DFAB'
+_BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct('<4sHHIIIQQQQ')
+
+
+def save_dfa_binary(dfa, path):
+    # Write the compiled transition table of `dfa` (see load_dfa_binary)
+    c = dfa.compiled or dfa.compile()
+    names = json.dumps({'states': c.state_names, 'symbols': c.symbols,
+                        'alphabet': sorted(map(str, dfa.alphabet))}).encode('utf-8')
+    table = c.table if isinstance(c.table, array) else array('i', c.table)
+    if sys.byteorder != 'little':
+        table = array('i', table)
+        table.byteswap()
+    names_off = _BINARY_HEADER.size
+    accept_off = names_off + len(names)
+    table_off = (accept_off + len(c.accepting) + 7) & ~7
+    header = _BINARY_HEADER.pack(_BINARY_MAGIC, _BINARY_VERSION, 0, c.num_states, len(c.symbols),
+                                 c.start, names_off, len(names), accept_off, table_off)
+    with open(path, 'wb') as fh:
+        fh.write(header)
+        fh.write(names)
+        fh.write(bytes(c.accepting))
+        fh.write(b'\0' * (table_off - accept_off - len(c.accepting)))
+        fh.write(table.tobytes())
+
+
+def load_dfa_binary(path):
+    # Map a file written by save_dfa_binary; the transition table is used in
+    # place from the mapping (on little-endian hosts), without parsing
+    mm = _map_file(path)
+    head = mm[:_BINARY_HEADER.size]
+    if len(head) < _BINARY_HEADER.size or head[:4] != _BINARY_MAGIC:
+        raise ValueError(f"{path} is not a binary DFA file")
+    (_, version, _, num_states, num_symbols, start,
+     names_off, names_len, accept_off, table_off) = _BINARY_HEADER.unpack(head)
+    if version != _BINARY_VERSION:
+        raise ValueError(f"Unsupported binary DFA version {version}")
+    size = num_states * (num_symbols + 1) * 4
+    if (names_off + names_len > len(mm) or accept_off + num_states > len(mm)
+            or table_off % 4 or table_off + size > len(mm) or not 0 < start < num_states):
+        raise ValueError(f"{path} is truncated or corrupt")
+    names = json.loads(bytes(mm[names_off:names_off + names_len]))
+    if (not isinstance(names, dict) or not isinstance(names.get('alphabet'), list)
+            or len(names.get('states') or ()) != num_states or len(names.get('symbols') or ()) != num_symbols):
+        raise ValueError(f"{path} is truncated or corrupt")
+    accepting = bytearray(mm[accept_off:accept_off + num_states])
+    table = memoryview(mm)[table_off:table_off + size].cast('i')
+    if sys.byteorder != 'little':
+        table = array('i', table)
+        table.byteswap()
+    c = CompiledDFA(names['states'], names['symbols'], table, start, accepting)
+    return DFA.from_compiled(c, names['alphabet'])
+
+
+class _TableTransitions(Mapping):
+    # Read-only {(state, symbol): state} view over a compiled table, so DFAs
+    # loaded from the binary format need no transition dict
+    def __init__(self, compiled):
+        self._c = compiled
+        self._len = None
+
+    def __getitem__(self, key):
+        c = self._c
+        src, sym = key
+        i, col = c.state_index.get(src), c.symbol_index.get(sym)
+        t = DEAD if i is None or col is None else c.table[i * c.width + col]
+        if t == DEAD:
+            raise KeyError(key)
+        return c.state_names[t]
+
+    def _cells(self):
+        c = self._c
+        names, symbols, table, width = c.state_names, c.symbols, c.table, c.width
+        for s in range(1, c.num_states):
+            row = s * width
+            for col, sym in enumerate(symbols):
+                t = table[row + col]
+                if t != DEAD:
+                    yield (names[s], sym), names[t]
+
+    def __iter__(self):
+        return (key for key, _ in self._cells())
+
+    def __len__(self):
+        if self._len is None:
+            self._len = sum(1 for _ in self._cells())
+        return self._len
+
+    def items(self):
+        return _TableItems(self)
+
+
+class _TableItems(ItemsView):
+    def __iter__(self):
+        return self._mapping._cells()
+
+
+def load_dfa(path):
+    # Load a DFA file: .json uses the JSON structure, files starting with the
+    # binary magic the compiled format, anything else the TXT format
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        with open(path, encoding='utf-8') as fh:
+            return load_dfa_json(fh)
+    with open(path, 'rb') as fh:
+        binary = fh.read(len(_BINARY_MAGIC)) == _BINARY_MAGIC
+    if binary:
+        return load_dfa_binary(path)
+    with open(path, encoding='utf-8') as fh:
+        return parse_dfa_text(fh)
+
+
+# Result images shown inline in the test screen and in the result window
+_PREVIEW_SIZE = (760, 480)
+_WINDOW_SIZE = (680, 440)
+# How often the UI checks on background jobs (~60 fps)
+_POLL_MS = 16
+
+
+# Height (px) of the text strip added below exported diagrams
+_ANNOTATION_H = 110
+
+
+def compose_result_image(diagram, input_string, result, path):
+    # The diagram (a path or an already decoded PIL image) with the test
+    # input, result and path stamped in a white strip below it, as RGBA
+    _require_pil()
+    with METRICS.phase('image_open'):
+        img = Image.open(diagram) if isinstance(diagram, (str, os.PathLike)) else diagram
+        img = img.convert("RGBA")
+    new_img = Image.new("RGBA", (img.width, img.height + _ANNOTATION_H), "white")
+    new_img.paste(img, (0, 0))
+
+    draw = ImageDraw.Draw(new_img)
+    font = ImageFont.load_default()
+    text = f"Input: {input_string}\nResult: {result}\nPath: {' -> '.join(path)}"
+    draw.text((10, img.height + 10), text, fill="black", font=font)
+    return new_img
+
+
+def _is_jpeg(export_path):
+    return str(export_path).lower().endswith((".jpg", ".jpeg"))
+
+
+def save_result_image(img, export_paths, executor=None):
+    # Encode one composed image to several files at once; the format follows
+    # each extension. PIL releases the GIL while encoding, so the files are
+    # written by a thread pool (`executor`, or a short-lived one per call).
+    export_paths = [export_paths] if isinstance(export_paths, (str, os.PathLike)) else list(export_paths)
+    # JPEG has no alpha: convert once for all JPEG targets
+    rgb = img.convert("RGB") if any(map(_is_jpeg, export_paths)) else None
+
+    def encode(export_path):
+        with METRICS.phase('image_save'):
+            (rgb if _is_jpeg(export_path) else img).save(export_path)
+        return export_path
+
+    if len(export_paths) == 1:
+        return [encode(export_paths[0])]
+    if executor is not None:
+        return [f.result() for f in [executor.submit(encode, p) for p in export_paths]]
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=len(export_paths), thread_name_prefix="dfa-export") as pool:
+        return list(pool.map(encode, export_paths))
+
+
+def export_result_image(diagram_path, input_string, result, path, export_path):
+    # Save the diagram with the test input, result and path stamped below it.
+    # `export_path` may also be a list: the diagram is decoded and composed
+    # once, then every file is encoded concurrently.
+    with METRICS.phase('export'):
+        img = compose_result_image(diagram_path, input_string, result, path)
+        return save_result_image(img, export_path)
+
+
+def _safe_filename(text, limit=40):
+    return re.sub(r'[^\w.-]', '_', text)[:limit] or 'empty'
+
+
+def export_results_batch(dfa, inputs, out_dir, formats=("png",), heatmap=False, workers=None, start=0):
+    # Annotated result images for many inputs. The layout is computed once
+    # (per input for automata big enough for a reduced diagram, see
+    # DFA.visualize). Everything that reads the automaton (simulation and
+    # the graphviz descriptions) happens in order on the calling thread, as
+    # lazy automata are not thread-safe; the pool threads only lay out,
+    # highlight, compose and encode. SVG output needs one dot run per input.
+    # Files are numbered from `start`; returns {number: [paths]}.
+    from concurrent.futures import ThreadPoolExecutor
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    formats = [fmt.lower().lstrip('.') for fmt in formats]
+    raster = [fmt for fmt in formats if fmt != 'svg']
+    runs = [(i, s, *dfa.process(s), dfa._edge_hits(s)) for i, s in enumerate(inputs, start)]
+    shared = None
+    if raster:
+        _require_pil()
+        if len(dfa.states) <= DEFAULT_LOD_STATES:
+            f, edges = dfa._diagram(str(out_dir / 'dfa'), 'png')
+            shared = DiagramLayout.for_graph(f), edges
+            shared[0]._base()  # build the shared base image before the workers copy it
+    jobs = []
+    for i, input_string, accepted, path, hits in runs:
+        stem = out_dir / f"dfa_result_{i:04d}_{_safe_filename(input_string)}"
+        # large automata get a reduced diagram around each path
+        graph = dfa._diagram(str(stem), 'png', view=dfa._lod_view(path)) if raster and not shared else None
+        svg = _result_svg_graph(dfa, path, hits, heatmap) if 'svg' in formats else None
+        jobs.append((i, input_string, accepted, path, hits, stem, graph, svg))
+
+    def export(i, input_string, accepted, path, hits, stem, graph, svg):
+        result = "Accepted" if accepted else "Rejected"
+        written = []
+        if raster:
+            if shared:
+                layout, edges = shared
+            else:
+                f, edges = graph
+                layout = DiagramLayout.for_graph(f)
+            img = layout.image(_edge_styles(edges, hits, heatmap))
+            img = compose_result_image(img, input_string, result, path)
+            written += save_result_image(img, [f"{stem}.{fmt}" for fmt in raster])
+        if svg is not None:
+            written.append(_write_result_svg(svg, input_string, result, path, f"{stem}.svg"))
+        return i, written
+
+    with METRICS.phase('export_batch'), \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dfa-export") as pool:
+        return dict(pool.map(lambda job: export(*job), jobs))
+
+
+def annotate_svg(svg, input_string, result, path, line_height=14):
+    # Add the result strip to graphviz SVG text: the canvas is made taller and
+    # the annotation appended as <text> elements, with no rasterization
+    from xml.sax.saxutils import escape
+
+    head = re.search(r'<svg\b[^>]*>', svg)
+    if head is None:
+        raise ValueError("Not an SVG document")
+    tag = head.group(0)
+    strip = line_height * 4
+    box = re.search(r'viewBox="([-\d.]+)[ ,]+([-\d.]+)[ ,]+([-\d.]+)[ ,]+([-\d.]+)"', tag)
+    if box:
+        x0, y0, w, h = (float(v) for v in box.groups())
+    else:
+        x0 = y0 = 0.0
+        w = float(re.search(r'width="([\d.]+)', tag).group(1))
+        h = float(re.search(r'height="([\d.]+)', tag).group(1))
+
+    def taller(m):
+        return f'height="{float(m.group(1)) + strip:g}{m.group(2)}"'
+
+    new_tag = re.sub(r'height="([\d.]+)([a-z%]*)"', taller, tag, count=1)
+    new_tag = re.sub(r'viewBox="[^"]*"', f'viewBox="{x0:g} {y0:g} {w:g} {h + strip:g}"', new_tag, count=1)
+    lines = (f"Input: {input_string}", f"Result: {result}", f"Path: {' -> '.join(path)}")
+    y = y0 + h
+    texts = "".join(f'<text x="{x0 + 8:g}" y="{y + line_height * (k + 1):g}" font-family="monospace" '
+                    f'font-size="{line_height - 3}">{escape(line)}</text>\n' for k, line in enumerate(lines))
+    annotation = (f'<g id="annotation">\n<rect x="{x0:g}" y="{y:g}" width="{w:g}" height="{strip:g}" '
+                  f'fill="white"/>\n{texts}</g>\n')
+    end = svg.rindex('</svg>')
+    return svg[:head.start()] + new_tag + svg[head.end():end] + annotation + svg[end:]
+
+
+def export_result_svg(dfa, input_string, export_path, heatmap=False, run=None):
+    # Vector export: graphviz SVG with the highlighted path, annotated in
+    # place. `run` is an already computed (accepted, path) for input_string.
+    accepted, path = run or dfa.process(input_string)
+    return _write_result_svg(_result_svg_graph(dfa, path, dfa._edge_hits(input_string), heatmap), input_string,
+                             "Accepted" if accepted else "Rejected", path, export_path)
+
+
+def _result_svg_graph(dfa, path, hits, heatmap):
+    # The graphviz description for export_result_svg; reads the automaton,
+    # so it runs on the thread that owns it
+    f, _ = dfa._diagram(hits=hits, heatmap=heatmap, view=dfa._lod_view(path))
+    return f
+
+
+def _write_result_svg(graph, input_string, result, path, export_path):
+    with METRICS.phase('graphviz'):
+        svg = graph.pipe(format='svg').decode('utf-8')
+    svg = annotate_svg(svg, input_string, result, path)
+    with open(export_path, 'w', encoding='utf-8') as fh:
+        fh.write(svg)
+    return str(export_path)
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        from concurrent.futures import CancelledError
+        raise CancelledError()
+
+
+def _test_job(dfa, input_string, heatmap, lod=None, cache=None, cancel=None):
+    # Runs on the app's worker thread: simulate, render, then decode and scale
+    # the previews so the Tk thread only has to wrap them in PhotoImages.
+    # The last item is the run's _Capture (phases and counters, if enabled).
+    # A set `cancel` event stops the job at its next stage.
+    with METRICS.capture() as run, METRICS.phase('test'):
+        _check_cancel(cancel)
+        accepted, path, img_path = dfa.visualize(input_string, heatmap=heatmap, lod=lod, cache=cache,
+                                                 cancel=cancel)
+        _check_cancel(cancel)
+        _require_pil()
+        previews = {}
+        try:
+            with METRICS.phase('image_open'):
+                img = Image.open(img_path)
+                img.load()
+            with img, METRICS.phase('thumbnail'):
+                for name, size in (('inline', _PREVIEW_SIZE), ('window', _WINDOW_SIZE)):
+                    preview = img.copy()
+                    preview.thumbnail(size)
+                    previews[name] = preview
+        except Exception:
+            pass
+    return accepted, path, img_path, previews, run
 
 
 class DFAApp:
     def __init__(self, root):
+        _require_gui()
+        from concurrent.futures import ThreadPoolExecutor
+
         self.root = root
         self.root.title("DFA Playground")
         # Center & size
@@ -101,6 +3361,21 @@ class DFAApp:
         self.last_result = None
         self.last_path = None
         self.last_img_path = None
+        # Options
+        self.minimize_on_load = tk.BooleanVar(value=False)
+        self.heatmap = tk.BooleanVar(value=False)
+        self.timings = tk.BooleanVar(value=METRICS.enabled)
+        self.detail = tk.StringVar(value="auto")
+        self._prefix_cache = None
+        self._live_source = None
+        # Verdicts and diagrams of earlier runs, shared with other app instances
+        self._result_cache = ResultCache() if DEFAULT_RESULT_CACHE_BYTES > 0 else None
+        # Background work: one render thread; a newer run makes older jobs stale
+        # and signals the running one to stop at its next stage
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dfa-render")
+        self._job_id = 0
+        self._job = None
+        self._job_cancel = None
 
         # UI setup
         self.setup_menu()
@@ -112,8 +3387,11 @@ class DFAApp:
 
         # status bar
         self.status_var = tk.StringVar(value="Ready")
-        status = tk.Label(self.root, textvariable=self.status_var, bg=self.COL_PANEL, fg=self.COL_TEXT, anchor="w")
-        status.pack(side="bottom", fill="x")
+        status_bar = tk.Frame(self.root, bg=self.COL_PANEL)
+        status_bar.pack(side="bottom", fill="x")
+        self.progress = ttk.Progressbar(status_bar, mode="indeterminate", length=120)
+        status = tk.Label(status_bar, textvariable=self.status_var, bg=self.COL_PANEL, fg=self.COL_TEXT, anchor="w")
+        status.pack(side="left", fill="x", expand=True)
 
     def setup_define_frame(self):
         # clear
@@ -143,6 +3421,8 @@ class DFAApp:
         b_load.pack(fill="x", padx=8, pady=6)
         b_examples = tk.Button(left, text="Examples", relief="flat", bg=self.COL_CARD, fg=self.COL_TEXT, activebackground=self.COL_ACCENT, bd=0, command=self.load_example_dfa)
         b_examples.pack(fill="x", padx=8, pady=6)
+        b_regex = tk.Button(left, text="From Regex", relief="flat", bg=self.COL_CARD, fg=self.COL_TEXT, activebackground=self.COL_ACCENT, bd=0, command=self.define_from_regex)
+        b_regex.pack(fill="x", padx=8, pady=6)
 
         # Center area: main definition controls
         header = tk.Label(center, text="Define DFA", bg=self.COL_BG, fg=self.COL_TEXT, font=("Segoe UI", 16, "bold"))
@@ -212,6 +3492,10 @@ class DFAApp:
         run_btn.pack(side="left", padx=8)
         back_btn = tk.Button(entry_row, text="Back", command=self.show_define_frame, bg=self.COL_CARD, fg=self.COL_TEXT)
         back_btn.pack(side="left", padx=6)
+        # live verdict while typing (see _live_check)
+        self.live_label = tk.Label(entry_row, text="", bg=self.COL_BG, fg=self.COL_MUTED, font=("Segoe UI", 10, "bold"))
+        self.live_label.pack(side="left", padx=6)
+        self.input_entry.bind('<KeyRelease>', self._live_check)
 
         # result & preview
         self.result_label = tk.Label(center, text="No test run yet.", bg=self.COL_BG, fg=self.COL_TEXT, justify="left", font=("Consolas", 11))
@@ -258,7 +3542,7 @@ class DFAApp:
         states_ent = ttk.Entry(frm)
         states_ent.pack(fill="x", pady=4)
 
-        ttk.Label(frm, text="Alphabet symbols (comma separated):").pack(anchor="w")
+        ttk.Label(frm, text="Alphabet symbols (comma separated; ranges like a-z, \\d, \\p{L} or [0-9a-f]):").pack(anchor="w")
         alpha_ent = ttk.Entry(frm)
         alpha_ent.pack(fill="x", pady=4)
 
@@ -309,9 +3593,11 @@ class DFAApp:
                         transitions[(src.strip(), sym.strip())] = dst.strip()
 
                 # basic validation: ensure transitions defined for provided symbols/states is optional
-                self.dfa = DFA(states, alphabet, transitions, start_state, final_states)
-                self.dfa_summary.configure(text=f"DFA with {len(states)} states, alphabet size {len(alphabet)}")
-                self.status_var.set("DFA defined")
+                dfa = DFA(states, alphabet, transitions, start_state, final_states)
+                dfa.compile()  # reports malformed or conflicting range symbols
+                self.dfa, note = self._maybe_minimize(dfa)
+                self.dfa_summary.configure(text=f"DFA with {len(self.dfa.states)} states, alphabet size {len(alphabet)}")
+                self.status_var.set("DFA defined" + note)
                 form.destroy()
                 messagebox.showinfo("Success", "DFA defined successfully!")
             except Exception as e:
@@ -332,14 +3618,43 @@ class DFAApp:
             messagebox.showerror("Error", "Enter an input string!")
             return
 
+        # Simulation, rendering and image decoding run on the worker thread;
+        # a queued job from an earlier click is dropped and a running one
+        # stops between stages, so the new job starts without waiting for it
+        if self._job is not None:
+            self._job.cancel()
+            self._job_cancel.set()
+        self._job_id += 1
+        lod = None if self.detail.get() == "auto" else self.detail.get()
+        self._job_cancel = threading.Event()
+        self._job = self._executor.submit(_test_job, self.dfa, input_string, self.heatmap.get(), lod,
+                                          self._result_cache, self._job_cancel)
+        self.status_var.set(f"Running: {input_string} ...")
+        self.progress.pack(side="right", padx=6)
+        self.progress.start(15)
+        self.root.after(_POLL_MS, self._poll_test, self._job_id, self._job, input_string)
+
+    def _poll_test(self, job_id, job, input_string):
+        if job_id != self._job_id:
+            return  # superseded by a newer run
+        if not job.done():
+            self.root.after(_POLL_MS, self._poll_test, job_id, job, input_string)
+            return
+        self.progress.stop()
+        self.progress.pack_forget()
+        self._job = None
+        self._job_cancel = None
         try:
-            accepted, path, img_path = self.dfa.visualize(input_string)
+            accepted, path, img_path, previews, run = job.result()
         except Exception as e:
+            self.status_var.set("Render failed")
             messagebox.showerror("Error", f"Failed to render diagram:\n{e}")
             return
         result = "Accepted" if accepted else "Rejected"
 
         # Save last test info
+        if img_path != self.last_img_path:
+            _discard_render(self.last_img_path)
         self.last_input = input_string
         self.last_result = result
         self.last_path = path
@@ -348,14 +3663,14 @@ class DFAApp:
         # update UI inline
         self.result_label.configure(text=f"Input: {self.last_input}\nResult: {self.last_result}\nPath: {' -> '.join(self.last_path)}")
         self.status_var.set(f"Last run: {self.last_input} ({self.last_result})")
+        if run.phases:
+            self._show_timings(run)
         # enable save
-        self.save_button.state(['!disabled'])
+        self.save_button.config(state="normal")
 
         # Optional inline preview in test screen
         try:
-            preview_img = Image.open(img_path)
-            preview_img.thumbnail((760, 480))
-            self._preview_tk_img = ImageTk.PhotoImage(preview_img)  # keep reference
+            self._preview_tk_img = ImageTk.PhotoImage(previews['inline'])  # keep reference
             self.inline_image_label.configure(image=self._preview_tk_img)
         except Exception:
             # clear preview if present
@@ -365,10 +3680,11 @@ class DFAApp:
                 pass
 
         # Also open the result window for a larger view
-        self.open_result_window()
+        self.open_result_window(previews.get('window'))
 
-    def open_result_window(self):
-        # Create a new result window with a clear layout
+    def open_result_window(self, image=None):
+        # Create a new result window with a clear layout; `image` is an already
+        # decoded and scaled diagram (otherwise it is loaded from last_img_path)
         result_win = tk.Toplevel(self.root)
         result_win.title("Test Result")
         result_win.geometry("720x640")  # give enough space
@@ -383,10 +3699,11 @@ class DFAApp:
         mid_frame = tk.Frame(result_win)
         mid_frame.pack(fill="both", expand=True, padx=12, pady=8)
         try:
-            img = Image.open(self.last_img_path)
-            # Fit image to window width while keeping aspect
-            max_w, max_h = 680, 440
-            img.thumbnail((max_w, max_h))
+            img = image
+            if img is None:
+                img = Image.open(self.last_img_path)
+                # Fit image to window width while keeping aspect
+                img.thumbnail(_WINDOW_SIZE)
             tk_img = ImageTk.PhotoImage(img)
             img_label = tk.Label(mid_frame, image=tk_img, borderwidth=1, relief="solid")
             img_label.image = tk_img  # keep reference
@@ -402,14 +3719,16 @@ class DFAApp:
             try:
                 png_path = f"dfa_result_{self.last_input}.png"
                 jpg_path = f"dfa_result_{self.last_input}.jpg"
-                self.export_result_image(self.last_img_path, self.last_input, self.last_result, self.last_path, png_path)
-                self.export_result_image(self.last_img_path, self.last_input, self.last_result, self.last_path, jpg_path)
+                # one decode and compose, both files encoded in parallel
+                self.export_result_image(self.last_img_path, self.last_input, self.last_result, self.last_path,
+                                         [png_path, jpg_path])
                 messagebox.showinfo("Saved", f"Results saved as:\n{os.path.abspath(png_path)}\n{os.path.abspath(jpg_path)}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save images:\n{e}")
 
         # also allow saving via menu / inline save
-        self.status_var.set(f"Result ready: {self.last_input} ({self.last_result})")
+        if not METRICS.enabled:
+            self.status_var.set(f"Result ready: {self.last_input} ({self.last_result})")
 
         save_btn = tk.Button(bottom_frame, text="Save as PNG/JPG", command=save_action)
         ok_btn = tk.Button(bottom_frame, text="OK", command=result_win.destroy)
@@ -417,22 +3736,48 @@ class DFAApp:
         save_btn.pack(side="left", padx=6)
         ok_btn.pack(side="right", padx=6)
 
+    def _show_timings(self, run):
+        # Phase breakdown of the last test: total and top phases in the status
+        # bar, every phase and counter in the inspector
+        totals = run.totals()
+        total = totals.pop('test', None)
+        slowest = dict(sorted(totals.items(), key=lambda kv: -kv[1]))
+        head = f"Last run: {self.last_input} ({self.last_result})"
+        if total is not None:
+            head += f" in {total * 1000:.1f} ms"
+        self.status_var.set(f"{head} - {_format_timings(slowest, 3)}")
+        lines = [f"Input: {self.last_input}", f"Result: {self.last_result}", ""]
+        lines += [f"{name}: {sec * 1000:.1f} ms" for name, sec in totals.items()]
+        lines += [f"{name}: {n}" for name, n in sorted(run.counters.items())]
+        self.inspector_result.configure(text="\n".join(lines))
+
+    def toggle_timings(self):
+        METRICS.enabled = self.timings.get()
+        self.status_var.set("Timings on" if METRICS.enabled else "Timings off")
+
+    def export_metrics(self):
+        # Save the accumulated timers/counters as JSON or a pstats profile
+        p = filedialog.asksaveasfilename(defaultextension='.json', initialfile='dfa_metrics.json',
+                                         filetypes=[('JSON', '*.json'), ('pstats profile', '*.prof')])
+        if not p:
+            return
+        try:
+            METRICS.dump(p)
+            self.status_var.set(f"Metrics saved to {os.path.basename(p)}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save metrics:\n{e}")
+
+    def clear_result_cache(self):
+        if self._result_cache is None:
+            return
+        try:
+            self._result_cache.clear()
+            self.status_var.set("Result cache cleared")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to clear the result cache:\n{e}")
+
     def export_result_image(self, diagram_path, input_string, result, path, export_path):
-        img = Image.open(diagram_path).convert("RGBA")
-        # Add a white strip at bottom with text
-        padding_h = 110
-        new_img = Image.new("RGBA", (img.width, img.height + padding_h), "white")
-        new_img.paste(img, (0, 0))
-
-        draw = ImageDraw.Draw(new_img)
-        font = ImageFont.load_default()
-        text = f"Input: {input_string}\nResult: {result}\nPath: {' -> '.join(path)}"
-        draw.text((10, img.height + 10), text, fill="black", font=font)
-
-        # Save as requested extension; convert to RGB for JPG
-        if export_path.lower().endswith(".jpg") or export_path.lower().endswith(".jpeg"):
-            new_img = new_img.convert("RGB")
-        new_img.save(export_path)
+        return export_result_image(diagram_path, input_string, result, path, export_path)
 
     def export_current_result(self):
         # wrapper used by save button in test screen
@@ -452,48 +3797,14 @@ class DFAApp:
             messagebox.showerror("Error", f"Failed to save image:\n{e}")
 
     def load_dfa_from_file(self):
-        # allow user to load a simple text format (same as form expectations)
-        p = filedialog.askopenfilename(filetypes=[('Text', '*.txt'), ('All files', '*.*')])
+        # allow user to load the text format (same as form expectations) or the JSON export
+        p = filedialog.askopenfilename(filetypes=[('Text', '*.txt'), ('JSON', '*.json'), ('All files', '*.*')])
         if not p:
             return
         try:
-            text = Path(p).read_text(encoding='utf-8')
-            # Expect a simple small format: lines starting with keywords, or a full transitions block
-            # We'll try to find keys: states:, alphabet:, start:, finals:, transitions:\n...
-            lines = [l.strip() for l in text.splitlines() if l.strip()]
-            data = {'states': '', 'alphabet': '', 'start': '', 'finals': '', 'transitions': []}
-            mode = None
-            for ln in lines:
-                low = ln.lower()
-                if low.startswith('states:'):
-                    data['states'] = ln.split(':',1)[1].strip()
-                elif low.startswith('alphabet:'):
-                    data['alphabet'] = ln.split(':',1)[1].strip()
-                elif low.startswith('start:'):
-                    data['start'] = ln.split(':',1)[1].strip()
-                elif low.startswith('finals:') or low.startswith('final states:'):
-                    data['finals'] = ln.split(':',1)[1].strip()
-                elif low.startswith('transitions:'):
-                    mode = 'transitions'
-                else:
-                    if mode == 'transitions':
-                        data['transitions'].append(ln)
-            # Build DFA if possible
-            if not data['states'] or not data['alphabet'] or not data['start']:
-                messagebox.showerror('Error', 'File missing required DFA fields (states, alphabet, start)')
-                return
-            states = set(s.strip() for s in data['states'].split(',') if s.strip())
-            alphabet = set(a.strip() for a in data['alphabet'].split(',') if a.strip())
-            final_states = set(s.strip() for s in data['finals'].split(',') if s.strip())
-            transitions = {}
-            for ln in data['transitions']:
-                if '->' in ln and ',' in ln:
-                    left, dst = ln.split('->',1)
-                    src, sym = left.split(',',1)
-                    transitions[(src.strip(), sym.strip())] = dst.strip()
-            self.dfa = DFA(states, alphabet, transitions, data['start'], final_states)
+            self.dfa, note = self._maybe_minimize(load_dfa(p))
             self.dfa_summary.configure(text=f"DFA loaded from {os.path.basename(p)}")
-            self.status_var.set('DFA loaded')
+            self.status_var.set('DFA loaded' + note)
             messagebox.showinfo('Loaded', 'DFA loaded successfully from file')
         except Exception as e:
             messagebox.showerror('Error', f'Failed to load DFA:\n{e}')
@@ -502,10 +3813,24 @@ class DFAApp:
         menubar = tk.Menu(self.root)
         filem = tk.Menu(menubar, tearoff=0)
         filem.add_command(label='Load DFA...', command=self.load_dfa_from_file)
+        filem.add_command(label='Export Metrics...', command=self.export_metrics)
         filem.add_separator()
         filem.add_command(label='Exit', command=self.root.quit)
         menubar.add_cascade(label='File', menu=filem)
 
+        optm = tk.Menu(menubar, tearoff=0)
+        optm.add_checkbutton(label='Minimize DFA on load', variable=self.minimize_on_load)
+        optm.add_checkbutton(label='Edge heatmap', variable=self.heatmap)
+        optm.add_checkbutton(label='Collect timings', variable=self.timings, command=self.toggle_timings)
+        detailm = tk.Menu(optm, tearoff=0)
+        for label, value in (('Auto', 'auto'), ('Full diagram', LOD_FULL),
+                             ('Near the path', LOD_PATH), ('Collapse components', LOD_SCC)):
+            detailm.add_radiobutton(label=label, variable=self.detail, value=value)
+        optm.add_cascade(label='Diagram detail', menu=detailm)
+        optm.add_separator()
+        optm.add_command(label='Clear Result Cache', command=self.clear_result_cache)
+        menubar.add_cascade(label='Options', menu=optm)
+
         helpm = tk.Menu(menubar, tearoff=0)
         def about():
             messagebox.showinfo('About', 'DFA Playground\nImproved UI')
@@ -514,6 +3839,14 @@ class DFAApp:
 
         self.root.config(menu=menubar)
 
+    def _maybe_minimize(self, dfa):
+        # Apply Hopcroft minimization when enabled in the Options menu. Returns
+        # (dfa, note); the caller appends the note to its own status message.
+        if not self.minimize_on_load.get():
+            return dfa, ""
+        minimal, _ = dfa.minimize()
+        return minimal, f" (minimized: {len(dfa.states)} -> {len(minimal.states)} states)"
+
     def show_home(self):
         # Navigate to define frame and show a friendly welcome in the center
         self.show_define_frame()
@@ -523,6 +3856,18 @@ class DFAApp:
         except Exception:
             pass
 
+    def define_from_regex(self):
+        pattern = _sd.askstring("From Regex", "Regular expression (matched against the whole input):", parent=self.root)
+        if pattern is None:
+            return
+        try:
+            self.dfa = DFA.from_regex(pattern)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.dfa_summary.configure(text=f"Regex DFA: {pattern} (states built on demand)")
+        self.status_var.set('Regex DFA defined')
+
     def load_example_dfa(self):
         # Build a small example DFA (binary strings ending with '01')
         states = {'q0', 'q1', 'q2'}
@@ -549,6 +3894,24 @@ class DFAApp:
         except Exception:
             pass
 
+    def _live_check(self, event=None):
+        # Accept/reject as the input is typed; the prefix cache makes each
+        # keystroke cost only the characters that changed
+        if not self.dfa:
+            return
+        if self._prefix_cache is None or self._live_source is not self.dfa:
+            # the render worker steps self.dfa at the same time, so a lazy
+            # automaton is checked through a clone with its own state cache
+            self._live_source = self.dfa
+            self._prefix_cache = PrefixCache(self.dfa.clone() if isinstance(self.dfa, LazyDFA) else self.dfa)
+        text = self.input_entry.get().strip()
+        if not text:
+            self.live_label.configure(text="")
+        elif self._prefix_cache.accepts(text):
+            self.live_label.configure(text="\u2713 Accepted", fg="#3ddc84")
+        else:
+            self.live_label.configure(text="\u2717 Rejected", fg="#ff6b6b")
+
     def _enter_pressed(self, event):
         # If focus is inside the input_entry, run test; otherwise ignore
         try:
@@ -557,8 +3920,144 @@ class DFAApp:
         except Exception:
             pass
 
-# --- Run the app ---
-if __name__ == "__main__":
+# --- Command line ---
+
+# Smaller batches are walked as a prefix trie, which also spares importing NumPy
+_CLI_VECTOR_MIN = 1024
+
+
+def _cli_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m Regex_Based_Text_Analyzer",
+        description="Test input strings against a DFA and write one JSON result per line. "
+                    "Run without arguments to open the GUI.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-d", "--dfa", help="DFA file (TXT format, or .json as in assets/dfa.json)")
+    source.add_argument("-r", "--regex", help="regular expression to compile into a DFA")
+    parser.add_argument("inputs", nargs="*", default=["-"],
+                        help="files with one input string per line (default: stdin)")
+    parser.add_argument("--path", action="store_true", help="include the state path of each input")
+    parser.add_argument("--minimize", action="store_true", help="minimize the DFA before testing")
+    parser.add_argument("--save-binary", metavar="OUT",
+                        help="write the compiled DFA in the binary format and exit")
+    parser.add_argument("--batch-size", type=int, default=65536,
+                        help="inputs evaluated per vectorized batch (default: %(default)s)")
+    parser.add_argument("--export", metavar="DIR",
+                        help="also write an annotated result image per input into DIR")
+    parser.add_argument("--export-format", default="png",
+                        help="comma-separated image formats for --export: png, jpg, svg "
+                             "(default: %(default)s)")
+    parser.add_argument("--metrics", metavar="OUT",
+                        help="collect phase timers and counters and write them to OUT "
+                             "(JSON, or a pstats profile if OUT ends in .prof)")
+    return parser
+
+
+def _read_lines(names):
+    for name in names:
+        fh = sys.stdin if name == "-" else open(name, encoding="utf-8")
+        try:
+            for line in fh:
+                yield line.rstrip("\r\n")
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _evaluate_batch(dfa, batch, with_path):
+    # JSONL lines and verdicts for one batch of inputs
+    dumps = json.dumps
+    if with_path:
+        results = [dfa.process(s) for s in batch]
+        lines = [dumps({"input": s, "accepted": ok, "path": path}) for s, (ok, path) in zip(batch, results)]
+        return lines, [ok for ok, _ in results]
+    verdicts = None
+    if len(batch) >= _CLI_VECTOR_MIN:
+        try:
+            verdicts = dfa.accepts_many(batch).tolist()
+        except ImportError:
+            pass  # NumPy is optional for the CLI
+    if verdicts is None:
+        verdicts = dfa.accepts_trie(batch)
+    return [dumps({"input": s, "accepted": ok}) for s, ok in zip(batch, verdicts)], verdicts
+
+
+def run_cli(argv):
+    args = _cli_parser().parse_args(argv)
+    if args.metrics:
+        METRICS.enabled = True
+    started = time.perf_counter()
+    try:
+        with METRICS.phase('load'):
+            dfa = DFA.from_regex(args.regex) if args.regex else load_dfa(args.dfa)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if args.minimize:
+        with METRICS.phase('minimize'):
+            dfa, _ = dfa.minimize()
+    if args.save_binary:
+        dfa.save_binary(args.save_binary)
+        return 0
+    loaded = time.perf_counter()
+
+    write = sys.stdout.write
+    count = accepted_count = 0
+    for batch in _batches(_read_lines(args.inputs), max(1, args.batch_size)):
+        METRICS.count('inputs', len(batch))
+        with METRICS.phase('evaluate'):
+            lines, verdicts = _evaluate_batch(dfa, batch, args.path)
+        with METRICS.phase('write'):
+            write("\n".join(lines) + "\n")
+        if args.export:
+            with METRICS.phase('export'):
+                export_results_batch(dfa, batch, args.export, args.export_format.split(","), start=count)
+        count += len(batch)
+        accepted_count += sum(verdicts)
+
+    finished = time.perf_counter()
+    elapsed = finished - loaded
+    stats = {
+        "inputs": count,
+        "accepted": accepted_count,
+        "load_seconds": round(loaded - started, 6),
+        "eval_seconds": round(elapsed, 6),
+        "inputs_per_second": round(count / elapsed, 1) if elapsed > 0 else None,
+    }
+    print(json.dumps(stats), file=sys.stderr)
+    if args.metrics:
+        METRICS.dump(args.metrics)
+    return 0
+
+
+def run_gui():
+    _require_gui()
     root = tk.Tk()
     app = DFAApp(root)
     root.mainloop()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        run_gui()
+        return 0
+    return run_cli(argv)
+
+
+# --- Run the app ---
+if __name__ == "__main__":
+    sys.exit(main())
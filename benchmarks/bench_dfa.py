@@ -0,0 +1,255 @@
+"""Benchmarks for the DFA engine, loaders and image export.
+
+    python benchmarks/bench_dfa.py --sizes 10,1000,100000 --output results.json
+    python benchmarks/bench_dfa.py --baseline results.json
+
+Every DFA and corpus is generated from --seed, so two runs on the same machine
+measure the same work. Results are written as JSON: ops/s, latency percentiles
+(ns) and peak traced memory (bytes) per case and DFA size. With --baseline each
+case also gets the ops/s ratio against the stored run, and the exit status is 1
+when any case is slower than the baseline by more than --tolerance.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import Regex_Based_Text_Analyzer as dfa_mod  # noqa: E402
+
+DEFAULT_SIZES = (10, 1000, 100000)
+DEFAULT_ALPHABET = 2
+# visualize() runs Graphviz; past this many states a run takes minutes
+MAX_RENDER_STATES = 50
+
+
+def random_dfa(num_states, alphabet_size=DEFAULT_ALPHABET, final_ratio=0.3, seed=0):
+    # Complete DFA like the web "Create Random" button: every (state, symbol)
+    # gets a uniformly random destination. States are q0..qN-1, symbols 0..k-1.
+    rng = random.Random(seed)
+    states = [f"q{i}" for i in range(num_states)]
+    alphabet = [str(i) for i in range(alphabet_size)] if alphabet_size <= 10 else \
+        [chr(ord('a') + i) for i in range(alphabet_size)]
+    transitions = {(s, a): states[rng.randrange(num_states)] for s in states for a in alphabet}
+    finals = {s for s in states if rng.random() < final_ratio} or {states[-1]}
+    return dfa_mod.DFA(set(states), set(alphabet), transitions, states[0], finals)
+
+
+def random_corpus(alphabet, count, length, seed=0):
+    # `count` strings over `alphabet`; lengths are uniform in [length//2, length]
+    rng = random.Random(seed)
+    symbols = sorted(alphabet)
+    return [''.join(rng.choices(symbols, k=rng.randint(length // 2, length))) for _ in range(count)]
+
+
+def dfa_to_json(dfa):
+    # JSON export structure (see assets/dfa.json / README)
+    return json.dumps({
+        'states': sorted(dfa.states), 'alphabet': sorted(dfa.alphabet),
+        'start': dfa.start_state, 'finals': sorted(dfa.final_states),
+        'transitions': [{'src': s, 'sym': a, 'dst': d} for (s, a), d in dfa.transitions.items()],
+    })
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+def measure(fn, items=1, min_time=0.5, min_runs=3, max_runs=10000):
+    # Call fn() until min_time has passed (at least min_runs times), then once
+    # more under tracemalloc for peak memory. `items` is the work done per
+    # call, so ops/s counts strings/bytes/etc. rather than calls.
+    fn()  # warm up caches (compiled tables, layouts, fonts)
+    gc.collect()
+    latencies = []
+    clock = time.perf_counter_ns
+    deadline = clock() + int(min_time * 1e9)
+    while len(latencies) < min_runs or (clock() < deadline and len(latencies) < max_runs):
+        t0 = clock()
+        fn()
+        latencies.append(clock() - t0)
+    latencies.sort()
+    total = sum(latencies)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'runs': len(latencies),
+        'items_per_run': items,
+        'ops_per_sec': items * len(latencies) / (total / 1e9) if total else None,
+        'latency_ns': {'min': latencies[0], 'p50': percentile(latencies, 50),
+                       'p90': percentile(latencies, 90), 'p99': percentile(latencies, 99),
+                       'max': latencies[-1]},
+        'peak_memory_bytes': peak,
+    }
+
+
+def _have_pil():
+    try:
+        dfa_mod._require_pil()
+    except ImportError:
+        return False
+    return True
+
+
+def cases(dfa, corpus, blob, workdir, size):
+    # (name, fn, items) for one DFA; fn=None marks a case skipped with reason `items`
+    text_path = workdir / 'dfa.txt'
+    json_path = workdir / 'dfa.json'
+    bin_path = workdir / 'dfa.bin'
+    text_path.write_text(dfa_mod.dfa_to_text(dfa), encoding='utf-8')
+    json_path.write_text(dfa_to_json(dfa), encoding='utf-8')
+    dfa_mod.save_dfa_binary(dfa, bin_path)
+    longest = max(corpus, key=len)
+
+    yield 'compile', dfa.compile, 1
+    yield 'process', lambda: dfa.process(longest), len(longest)
+    yield 'process_no_trace', lambda: dfa.process(longest, trace=dfa_mod.TRACE_NONE), len(longest)
+    yield 'accepts_many', lambda: dfa.accepts_many(corpus), len(corpus)
+    yield 'accepts_trie', lambda: dfa.accepts_trie(corpus), len(corpus)
+    yield 'process_stream', lambda: dfa.process_stream(blob), len(blob)
+    yield 'load_text', lambda: dfa_mod.load_dfa(text_path), 1
+    yield 'load_json', lambda: dfa_mod.load_dfa(json_path), 1
+    yield 'load_binary', lambda: dfa_mod.load_dfa(bin_path), 1
+
+    if size > MAX_RENDER_STATES:
+        yield 'visualize', None, f'more than {MAX_RENDER_STATES} states'
+    elif shutil.which('dot') is None:
+        yield 'visualize', None, 'graphviz dot not found'
+    else:
+        short = corpus[0]
+        yield 'visualize', lambda: dfa.visualize(short, filename=str(workdir / 'diagram')), 1
+
+    if not _have_pil():
+        yield 'export_result_image', None, 'Pillow not installed'
+    else:
+        # A fixed-size synthetic diagram, so the case does not depend on dot
+        diagram = workdir / 'synthetic.png'
+        dfa_mod.Image.new('RGBA', (1200, 800), 'white').save(diagram)
+        accepted, path = dfa.process(corpus[0])
+        out = str(workdir / 'export.png')
+        result = 'Accepted' if accepted else 'Rejected'
+        yield 'export_result_image', lambda: dfa_mod.export_result_image(
+            str(diagram), corpus[0], result, path, out), 1
+        both = [out, str(workdir / 'export.jpg')]
+        yield 'export_png_jpg', lambda: dfa_mod.export_result_image(
+            str(diagram), corpus[0], result, path, both), 1
+
+
+def run(sizes, alphabet_size, strings, length, stream_bytes, seed, min_time, only=None, log=None):
+    results = []
+    with tempfile.TemporaryDirectory(prefix='dfa_bench_') as tmp:
+        # keep diagram layouts out of the user's cache
+        os.environ.setdefault('DFA_CACHE_DIR', str(Path(tmp) / 'cache'))
+        dfa_mod.CACHE_DIR = Path(os.environ['DFA_CACHE_DIR'])
+        for size in sizes:
+            workdir = Path(tmp) / str(size)
+            workdir.mkdir()
+            t0 = time.perf_counter()
+            dfa = random_dfa(size, alphabet_size, seed=seed)
+            corpus = random_corpus(dfa.alphabet, strings, length, seed=seed)
+            symbols = sorted(dfa.alphabet)
+            rng = random.Random(seed)
+            blob = ''.join(rng.choices(symbols, k=stream_bytes)).encode('latin-1')
+            if log:
+                log(f"size {size}: generated in {time.perf_counter() - t0:.2f}s")
+            for name, fn, items in cases(dfa, corpus, blob, workdir, size):
+                if only and name not in only:
+                    continue
+                entry = {'case': name, 'states': size}
+                if fn is None:
+                    entry['skipped'] = items
+                else:
+                    entry.update(measure(fn, items, min_time=min_time))
+                results.append(entry)
+                if log:
+                    rate = entry.get('ops_per_sec')
+                    log(f"  {name:<20} " + (f"{rate:,.0f} ops/s" if rate else f"skipped: {entry['skipped']}"))
+            del dfa, corpus, blob
+            gc.collect()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Attach ops/s ratios against `baseline`; returns the regressed cases
+    base = {(r['case'], r['states']): r for r in baseline.get('results', ())}
+    regressions = []
+    for r in results:
+        old = base.get((r['case'], r['states']))
+        if not old or not r.get('ops_per_sec') or not old.get('ops_per_sec'):
+            continue
+        ratio = r['ops_per_sec'] / old['ops_per_sec']
+        r['baseline_ratio'] = ratio
+        if ratio < 1 - tolerance:
+            regressions.append(f"{r['case']}@{r['states']}")
+    return regressions
+
+
+def _int_list(value):
+    return [int(float(v)) for v in value.split(',') if v.strip()]
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    p.add_argument('--sizes', type=_int_list, default=list(DEFAULT_SIZES),
+                   help='comma-separated DFA state counts, e.g. 10,1000,1e6')
+    p.add_argument('--alphabet', type=int, default=DEFAULT_ALPHABET, help='alphabet size')
+    p.add_argument('--strings', type=int, default=10000, help='corpus size for accepts_many')
+    p.add_argument('--length', type=int, default=64, help='maximum corpus string length')
+    p.add_argument('--stream-bytes', type=int, default=1 << 20, help='input size for process_stream')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--min-time', type=float, default=0.5, help='seconds to repeat each case')
+    p.add_argument('--only', help='comma-separated case names to run')
+    p.add_argument('--output', help='write the JSON report here instead of stdout')
+    p.add_argument('--baseline', help='JSON report to compare ops/s against')
+    p.add_argument('--tolerance', type=float, default=0.1,
+                   help='allowed slowdown against the baseline (fraction)')
+    p.add_argument('-q', '--quiet', action='store_true', help='no progress on stderr')
+    args = p.parse_args(argv)
+
+    log = None if args.quiet else (lambda msg: print(msg, file=sys.stderr, flush=True))
+    only = set(args.only.split(',')) if args.only else None
+    results = run(args.sizes, args.alphabet, args.strings, args.length, args.stream_bytes,
+                  args.seed, args.min_time, only, log)
+    report = {
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'quiet')},
+        'environment': {'python': sys.version.split()[0], 'implementation': platform.python_implementation(),
+                        'machine': platform.machine(), 'platform': platform.platform()},
+        'results': results,
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        report['regressions'] = regressions
+        if regressions:
+            status = 1
+            if log:
+                log(f"slower than baseline: {', '.join(regressions)}")
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
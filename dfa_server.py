@@ -0,0 +1,609 @@
+"""Local DFA evaluation server: compiled DFAs kept in memory, JSONL over a socket.
+
+    python dfa_server.py --socket /tmp/dfa.sock
+    python dfa_server.py --port 8765            # TCP on 127.0.0.1
+
+Each request is one JSON object on one line and gets exactly one reply line,
+in request order. Connections stay open, and clients may pipeline: send many
+requests before reading any reply. An "id" field is copied to the reply;
+failures come back as {"error": "..."}.
+
+    {"op": "register", "dfa": {...}}          JSON structure (see assets/dfa.json)
+    {"op": "register", "text": "states: ..."} TXT format
+    {"op": "register", "regex": "(0|1)*01"}
+    {"op": "register", "file": "dfa.bin"}     any file load_dfa reads, relative
+                                              to --load-dir (off without it)
+        -> {"key": "<sha256 of the canonical DFA>"}
+    {"op": "eval", "key": K, "inputs": ["01", ...], "path": false}
+        -> {"accepted": [true, ...]}  or, with "path": true,
+           {"results": [[true, ["q0", ...]], ...]}
+    {"op": "drop", "key": K}
+    {"op": "stats"}
+    {"op": "ping"}
+
+Registering the same automaton twice returns the same key without compiling
+it again. Batches of at least --pool-min inputs are split over a process
+pool, whose workers load the DFA once from a copy in the binary format.
+Smaller batches and registration run on threads, so a long request never
+holds up the event loop.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import queue
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from pathlib import Path
+
+import Regex_Based_Text_Analyzer as dfa_mod
+
+DEFAULT_MAX_DFAS = 256
+# Batches this large go to the process pool; smaller ones to a thread, so the
+# event loop keeps serving other connections meanwhile
+DEFAULT_POOL_MIN = 100000
+# Longest request line accepted (a batch of inputs is one line)
+DEFAULT_LINE_LIMIT = 256 << 20
+# Requests a connection may have in flight before the server stops reading it
+_MAX_PIPELINE = 1024
+# accepts_many pays off from about this many inputs (see the CLI)
+_VECTOR_MIN = 1024
+# Stats keep this many latencies per op, and throughput over this many seconds
+_LATENCY_WINDOW = 10000
+_RATE_WINDOW = 10.0
+
+
+def evaluate(dfa, inputs, with_path=False):
+    # Verdicts for a list of inputs, or [accepted, path] pairs with with_path
+    if with_path:
+        return [list(dfa.process(s)) for s in inputs]
+    if len(inputs) >= _VECTOR_MIN:
+        try:
+            return dfa.accepts_many(inputs).tolist()
+        except ImportError:
+            pass
+    return dfa.accepts_trie(inputs)
+
+
+# Per worker process: DFAs loaded from the registry's binary copies
+_worker_dfas = OrderedDict()
+
+
+def _pool_evaluate(key, blob_path, inputs, with_path):
+    dfa = _worker_dfas.get(key)
+    if dfa is None:
+        dfa = _worker_dfas[key] = dfa_mod.load_dfa_binary(blob_path)
+        while len(_worker_dfas) > DEFAULT_MAX_DFAS:
+            _worker_dfas.popitem(last=False)
+    else:
+        _worker_dfas.move_to_end(key)
+    return evaluate(dfa, inputs, with_path)
+
+
+class Registry:
+    # Compiled DFAs by content hash (DFA.fingerprint); the least recently
+    # used is dropped past max_entries. Binary copies for the process pool
+    # are written to `folder` on first use and reference counted: a copy
+    # that pool jobs still read is only deleted once the last one releases it.
+    def __init__(self, folder, max_entries=DEFAULT_MAX_DFAS):
+        self.folder = Path(folder)
+        self.max_entries = max_entries
+        self._dfas = OrderedDict()
+        self._blob_users = Counter()
+
+    def __len__(self):
+        return len(self._dfas)
+
+    def add(self, dfa):
+        key = dfa.fingerprint()
+        if key in self._dfas:
+            self._dfas.move_to_end(key)
+            return key
+        dfa.compiled or dfa.compile()
+        self._dfas[key] = dfa
+        while len(self._dfas) > self.max_entries:
+            self.drop(next(iter(self._dfas)))
+        return key
+
+    def get(self, key):
+        dfa = self._dfas.get(key)
+        if dfa is None:
+            raise ValueError(f"Unknown DFA key: {key!r}")
+        self._dfas.move_to_end(key)
+        return dfa
+
+    def drop(self, key):
+        found = self._dfas.pop(key, None) is not None
+        if not self._blob_users[key]:
+            self._unlink_blob(key)
+        return found
+
+    def acquire_blob(self, key):
+        # (dfa, path of its binary copy); pair with release_blob. The copy
+        # may not exist yet: write_blob creates it, off the event loop.
+        dfa = self.get(key)
+        self._blob_users[key] += 1
+        return dfa, str(self.folder / f"{key}.bin")
+
+    @staticmethod
+    def write_blob(dfa, path):
+        if not os.path.exists(path):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            dfa_mod.save_dfa_binary(dfa, tmp)
+            os.replace(tmp, path)
+
+    def release_blob(self, key):
+        self._blob_users[key] -= 1
+        if not self._blob_users[key]:
+            del self._blob_users[key]
+            if key not in self._dfas:
+                self._unlink_blob(key)
+
+    def _unlink_blob(self, key):
+        try:
+            os.unlink(self.folder / f"{key}.bin")
+        except FileNotFoundError:
+            pass
+
+
+class Stats:
+    # Request counters, a window of recent latencies per op and the number
+    # of inputs evaluated in the last _RATE_WINDOW seconds
+    def __init__(self):
+        self.started = time.time()
+        self.requests = Counter()
+        self.errors = 0
+        self.inputs = 0
+        self.pool_batches = 0
+        self.connections = 0
+        self.open_connections = 0
+        self._latency = {}
+        self._recent = deque()  # (finish time, inputs)
+
+    def record(self, op, seconds, inputs=0):
+        self.requests[op] += 1
+        self._latency.setdefault(op, deque(maxlen=_LATENCY_WINDOW)).append(seconds)
+        if inputs:
+            now = time.monotonic()
+            self.inputs += inputs
+            self._recent.append((now, inputs))
+            while self._recent[0][0] < now - _RATE_WINDOW:
+                self._recent.popleft()
+
+    def snapshot(self, registry_size=0):
+        now = time.monotonic()
+        while self._recent and self._recent[0][0] < now - _RATE_WINDOW:
+            self._recent.popleft()
+        uptime = time.time() - self.started
+        latency = {}
+        for op, values in self._latency.items():
+            ordered = sorted(values)
+            latency[op] = {'p50': _percentile(ordered, 50) * 1e3, 'p90': _percentile(ordered, 90) * 1e3,
+                           'p99': _percentile(ordered, 99) * 1e3, 'max': ordered[-1] * 1e3}
+        return {
+            'uptime_s': uptime,
+            'connections': self.connections,
+            'open_connections': self.open_connections,
+            'requests': dict(self.requests),
+            'errors': self.errors,
+            'inputs': self.inputs,
+            'inputs_per_sec': sum(n for _, n in self._recent) / _RATE_WINDOW,
+            'inputs_per_sec_total': self.inputs / uptime if uptime else 0.0,
+            'pool_batches': self.pool_batches,
+            'registry': registry_size,
+            'latency_ms': latency,
+        }
+
+
+def _percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted, non-empty list
+    k = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+class DFAServer:
+    # asyncio server for the JSONL protocol in the module docstring. Listens
+    # on a Unix socket if socket_path is given, otherwise on host:port.
+    def __init__(self, socket_path=None, host='127.0.0.1', port=None, workers=None,
+                 pool_min=DEFAULT_POOL_MIN, max_dfas=DEFAULT_MAX_DFAS, line_limit=DEFAULT_LINE_LIMIT,
+                 load_dir=None):
+        if socket_path is None and port is None:
+            raise ValueError("Give a socket path or a port")
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.pool_min = pool_min
+        self.line_limit = line_limit
+        # "file" registrations may only name files under this folder; None
+        # turns them off, since any client could otherwise read any path
+        self.load_dir = None if load_dir is None else Path(load_dir).resolve()
+        self._folder = tempfile.mkdtemp(prefix='dfa_server_')
+        self.registry = Registry(self._folder, max_dfas)
+        self.stats = Stats()
+        self._pool = None
+        self._threads = None
+        self._server = None
+        self._ops = {'register': self._register, 'eval': self._eval, 'drop': self._drop,
+                     'stats': self._stats, 'ping': self._ping}
+
+    async def start(self):
+        if self.socket_path is not None:
+            path = Path(self.socket_path)
+            if path.is_socket():
+                path.unlink()  # left over from a server that did not shut down
+            self._server = await asyncio.start_unix_server(self._handle, str(path), limit=self.line_limit)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=self.line_limit)
+            self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if self.socket_path is not None:
+                try:
+                    os.unlink(self.socket_path)
+                except FileNotFoundError:
+                    pass
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    async def _handle(self, reader, writer):
+        # Requests are read as fast as they arrive and each starts right
+        # away; the replies are written in request order by a second task
+        self.stats.connections += 1
+        self.stats.open_connections += 1
+        in_flight = asyncio.Queue(maxsize=_MAX_PIPELINE)
+
+        async def reply():
+            while True:
+                task = await in_flight.get()
+                if task is None:
+                    return
+                writer.write(await task)
+                if in_flight.empty():
+                    await writer.drain()
+
+        replier = asyncio.create_task(reply())
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # longer than line_limit; the rest of the stream cannot be framed
+                    await in_flight.put(_done(self._error_line(None, "Request line too long")))
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    await in_flight.put(asyncio.ensure_future(self._dispatch(line)))
+        except ConnectionError:
+            pass
+        finally:
+            await in_flight.put(None)
+            try:
+                await replier
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.stats.open_connections -= 1
+
+    async def _dispatch(self, line):
+        t0 = time.perf_counter()
+        request_id = None
+        op = 'invalid'
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            request_id = request.get('id')
+            op = request.get('op')
+            handler = self._ops.get(op)
+            if handler is None:
+                raise ValueError(f"Unknown op: {op!r}")
+            reply, inputs = await handler(request)
+        except Exception as e:
+            self.stats.errors += 1
+            self.stats.record(op if op in self._ops else 'invalid', time.perf_counter() - t0)
+            return self._error_line(request_id, e)
+        self.stats.record(op, time.perf_counter() - t0, inputs)
+        if request_id is not None:
+            reply['id'] = request_id
+        return json.dumps(reply).encode('utf-8') + b'\n'
+
+    @staticmethod
+    def _error_line(request_id, error):
+        reply = {'error': str(error)}
+        if request_id is not None:
+            reply['id'] = request_id
+        return json.dumps(reply).encode('utf-8') + b'\n'
+
+    def _in_thread(self, fn, *args):
+        # Parsing, compiling and evaluating run off the event loop. Registered
+        # DFAs are plain tables (regexes are materialized), so threads can
+        # share them.
+        if self._threads is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._threads = ThreadPoolExecutor(self.workers, thread_name_prefix='dfa-eval')
+        return asyncio.get_running_loop().run_in_executor(self._threads, fn, *args)
+
+    async def _register(self, request):
+        return {'key': self.registry.add(await self._in_thread(_load_request, request, self.load_dir))}, 0
+
+    async def _eval(self, request):
+        key = request.get('key')
+        dfa = self.registry.get(key)
+        inputs = request.get('inputs')
+        if not isinstance(inputs, list) or not all(isinstance(s, str) for s in inputs):
+            raise ValueError("inputs must be a list of strings")
+        with_path = bool(request.get('path'))
+        if len(inputs) >= self.pool_min and self.workers > 1:
+            results = await self._eval_in_pool(key, inputs, with_path)
+        else:
+            results = await self._in_thread(evaluate, dfa, inputs, with_path)
+        return ({'results': results} if with_path else {'accepted': results}), len(inputs)
+
+    async def _eval_in_pool(self, key, inputs, with_path):
+        # One slice per worker; the DFA travels as the path of its binary copy
+        if self._pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawned, not forked: the event loop and its threads stay behind
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        dfa, blob = self.registry.acquire_blob(key)
+        try:
+            await self._in_thread(self.registry.write_blob, dfa, blob)
+            loop = asyncio.get_running_loop()
+            step = -(-len(inputs) // self.workers)
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(self._pool, _pool_evaluate, key, blob, inputs[i:i + step], with_path)
+                for i in range(0, len(inputs), step)))
+        finally:
+            self.registry.release_blob(key)
+        self.stats.pool_batches += 1
+        return [r for part in parts for r in part]
+
+    async def _drop(self, request):
+        return {'dropped': self.registry.drop(request.get('key'))}, 0
+
+    async def _stats(self, request):
+        snapshot = self.stats.snapshot(len(self.registry))
+        if dfa_mod.METRICS.enabled:
+            snapshot['metrics'] = dfa_mod.METRICS.snapshot()
+        return snapshot, 0
+
+    async def _ping(self, request):
+        return {'ok': True}, 0
+
+
+def _load_request(request, load_dir=None):
+    # The DFA named by a register request, compiled and fingerprinted
+    if 'dfa' in request:
+        dfa = dfa_mod.dfa_from_dict(request['dfa'])
+    elif 'text' in request:
+        dfa = dfa_mod.parse_dfa_text(request['text'])
+    elif 'regex' in request:
+        dfa = dfa_mod.DFA.from_regex(request['regex'], lazy=False)
+    elif 'file' in request:
+        dfa = dfa_mod.load_dfa(_allowed_file(request['file'], load_dir))
+    else:
+        raise ValueError("register needs one of: dfa, text, regex, file")
+    dfa.compiled or dfa.compile()
+    dfa.fingerprint()
+    return dfa
+
+
+def _allowed_file(name, load_dir):
+    # name resolved under load_dir; symlinks and ".." may not lead outside it
+    if load_dir is None:
+        raise ValueError("File registration is disabled; start the server with --load-dir")
+    if not isinstance(name, str):
+        raise ValueError("file must be a string")
+    path = (load_dir / name).resolve()
+    if not path.is_relative_to(load_dir):
+        raise ValueError(f"{name!r} is outside the load directory")
+    return str(path)
+
+
+def _done(value):
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(value)
+    return future
+
+
+class DFAClient:
+    # Blocking client for DFAServer with a pool of keep-alive connections;
+    # one client can be shared by many threads. A call takes an idle
+    # connection (or opens one, up to pool_size), writes its requests and
+    # reads the replies in order. pipeline() puts a whole list of requests on
+    # the wire before reading, so the round trip is paid once.
+    def __init__(self, socket_path=None, host='127.0.0.1', port=None, pool_size=4, timeout=None):
+        if socket_path is None and port is None:
+            raise ValueError("Give a socket path or a port")
+        self.socket_path = socket_path
+        self.address = (host, port)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        if self.socket_path is not None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+        else:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock, sock.makefile('rb')
+
+    def pipeline(self, requests):
+        # Send every request, then read one reply per request; replies are
+        # returned as sent by the server (errors included, not raised)
+        if self._closed:
+            raise ValueError("Client is closed")
+        payload = b''.join(json.dumps(r).encode('utf-8') + b'\n' for r in requests)
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            sock, rfile = conn
+            try:
+                replies = self._exchange(sock, rfile, payload, len(requests))
+            except BaseException:
+                rfile.close()
+                sock.close()
+                raise
+            self._idle.put(conn)
+            return replies
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _exchange(sock, rfile, payload, count):
+        # With many requests the server may start replying before it has read
+        # them all; sending from a second thread keeps both sides moving
+        sender, failure = None, []
+        if count > 1:
+            def send():
+                try:
+                    sock.sendall(payload)
+                except OSError as e:
+                    failure.append(e)
+
+            sender = threading.Thread(target=send, daemon=True)
+            sender.start()
+        else:
+            sock.sendall(payload)
+        replies = []
+        for _ in range(count):
+            line = rfile.readline()
+            if not line:
+                break
+            replies.append(json.loads(line))
+        if sender is not None:
+            sender.join()
+        if failure:
+            raise failure[0]
+        if len(replies) < count:
+            raise ConnectionError("Server closed the connection")
+        return replies
+
+    def call(self, op, **fields):
+        reply = self.pipeline([dict(fields, op=op)])[0]
+        if 'error' in reply:
+            raise ValueError(reply['error'])
+        return reply
+
+    def register(self, dfa=None, text=None, regex=None, file=None):
+        # Returns the server's key for the automaton. `dfa` may be a DFA
+        # (sent in the TXT format) or the JSON structure as a dict.
+        if isinstance(dfa, dfa_mod.DFA):
+            return self.call('register', text=dfa_mod.dfa_to_text(dfa))['key']
+        for field, value in (('dfa', dfa), ('text', text), ('regex', regex), ('file', file)):
+            if value is not None:
+                return self.call('register', **{field: value})['key']
+        raise ValueError("register needs one of: dfa, text, regex, file")
+
+    def evaluate(self, key, inputs, path=False, batch_size=65536):
+        # Verdicts for `inputs` (or [accepted, path] pairs with path=True),
+        # sent as pipelined batches of batch_size over one connection
+        inputs = list(inputs)
+        requests = [{'op': 'eval', 'key': key, 'inputs': inputs[i:i + batch_size], 'path': path}
+                    for i in range(0, len(inputs), batch_size)]
+        out = []
+        for reply in self.pipeline(requests):
+            if 'error' in reply:
+                raise ValueError(reply['error'])
+            out.extend(reply['results'] if path else reply['accepted'])
+        return out
+
+    def drop(self, key):
+        return self.call('drop', key=key)['dropped']
+
+    def stats(self):
+        return self.call('stats')
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                sock, rfile = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            rfile.close()
+            sock.close()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    where = p.add_mutually_exclusive_group(required=True)
+    where.add_argument('--socket', help='Unix socket path to listen on')
+    where.add_argument('--port', type=int, help='TCP port on --host (0 picks a free port)')
+    p.add_argument('--host', default='127.0.0.1', help='TCP address (default: %(default)s)')
+    p.add_argument('--workers', type=int, default=None,
+                   help='processes for large batches (default: CPU count; 1 disables the pool)')
+    p.add_argument('--pool-min', type=int, default=DEFAULT_POOL_MIN,
+                   help='batch size from which the pool is used (default: %(default)s)')
+    p.add_argument('--max-dfas', type=int, default=DEFAULT_MAX_DFAS,
+                   help='compiled DFAs kept in memory (default: %(default)s)')
+    p.add_argument('--load-dir', default=None,
+                   help='folder "file" registrations are read from (default: file registration is off)')
+    args = p.parse_args(argv)
+
+    server = DFAServer(args.socket, args.host, args.port, args.workers, args.pool_min, args.max_dfas,
+                       load_dir=args.load_dir)
+
+    async def run():
+        # SIGINT/SIGTERM stop the server cleanly, so the socket file is removed
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await server.start()
+        where = args.socket or f"{args.host}:{server.port}"
+        print(f"Serving on {where}", file=sys.stderr, flush=True)
+        await stop.wait()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
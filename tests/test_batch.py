@@ -0,0 +1,30 @@
+import itertools
+import random
+
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA
+
+np = pytest.importorskip('numpy')
+
+WORDS = [''.join(p) for n in range(6) for p in itertools.product('abz', repeat=n)]
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_accepts_many_matches_process(seed):
+    rng = random.Random(seed)
+    states = [f"q{i}" for i in range(9)]
+    transitions = {(s, a): rng.choice(states) for s in states for a in 'ab' if rng.random() < 0.85}
+    dfa = DFA(set(states), {'a', 'b'}, transitions, states[0], {s for s in states if rng.random() < 0.4})
+    words = WORDS + [''.join(rng.choice('ab') for _ in range(rng.randrange(200))) for _ in range(50)]
+    rng.shuffle(words)
+    expected = [dfa.process(w)[0] for w in words]
+    result = dfa.accepts_many(words)
+    assert result.dtype == bool and result.tolist() == expected
+    assert dfa.accepts_many(iter(words)).tolist() == expected
+    assert dfa.accepts_trie(words) == expected
+
+
+def test_accepts_many_empty_batch():
+    dfa = DFA({'s'}, {'a'}, {('s', 'a'): 's'}, 's', {'s'})
+    assert dfa.accepts_many([]).shape == (0,)
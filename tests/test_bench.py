@@ -0,0 +1,40 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+import bench_dfa  # noqa: E402
+
+
+def test_generators_are_reproducible():
+    a, b = bench_dfa.random_dfa(50, 3, seed=4), bench_dfa.random_dfa(50, 3, seed=4)
+    assert a.transitions == b.transitions and a.final_states == b.final_states
+    assert len(a.transitions) == 50 * 3  # complete
+    assert bench_dfa.random_dfa(50, 3, seed=5).transitions != a.transitions
+    corpus = bench_dfa.random_corpus(a.alphabet, 20, 10, seed=1)
+    assert corpus == bench_dfa.random_corpus(a.alphabet, 20, 10, seed=1)
+    assert all(5 <= len(s) <= 10 and set(s) <= a.alphabet for s in corpus)
+
+
+def test_percentile_and_baseline_comparison():
+    assert bench_dfa.percentile([1, 2, 3, 4], 50) == 2
+    assert bench_dfa.percentile([], 50) is None
+    results = [{'case': 'process', 'states': 10, 'ops_per_sec': 80.0},
+               {'case': 'compile', 'states': 10, 'ops_per_sec': 100.0}]
+    baseline = {'results': [{'case': 'process', 'states': 10, 'ops_per_sec': 100.0},
+                            {'case': 'compile', 'states': 10, 'ops_per_sec': 100.0}]}
+    assert bench_dfa.compare(results, baseline, 0.1) == ['process@10']
+    assert results[0]['baseline_ratio'] == 0.8
+
+
+def test_main_writes_report(tmp_path, monkeypatch):
+    monkeypatch.setenv('DFA_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(bench_dfa.dfa_mod, 'CACHE_DIR', tmp_path / 'cache')
+    out = tmp_path / 'report.json'
+    argv = ['--sizes', '10', '--strings', '20', '--stream-bytes', '1000', '--min-time', '0',
+            '--only', 'compile,process', '--output', str(out), '-q']
+    assert bench_dfa.main(argv) == 0
+    report = json.loads(out.read_text(encoding='utf-8'))
+    assert [r['case'] for r in report['results']] == ['compile', 'process']
+    assert all(r['ops_per_sec'] > 0 for r in report['results'])
@@ -0,0 +1,82 @@
+import itertools
+import json
+import random
+
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA, dfa_to_text, load_dfa, parse_dfa_text, run_cli, save_dfa_binary
+
+
+def _random_dfa(num_states, symbols, density, seed):
+    # density < 1 leaves transitions undefined (a partial DFA)
+    rng = random.Random(seed)
+    states = [f"q{i}" for i in range(num_states)]
+    transitions = {(s, a): rng.choice(states) for s in states for a in symbols if rng.random() < density}
+    finals = {s for s in states if rng.random() < 0.4}
+    return DFA(set(states), set(symbols), transitions, states[0], finals)
+
+
+CASES = [
+    _random_dfa(1, 'a', 1.0, 0),
+    _random_dfa(6, 'ab', 1.0, 1),
+    _random_dfa(6, 'ab', 0.5, 2),
+    _random_dfa(30, 'abc', 0.7, 3),
+]
+INPUTS = [''.join(p) for n in range(5) for p in itertools.product('abcx1', repeat=n)]
+
+
+@pytest.mark.parametrize('dfa', CASES)
+def test_binary_round_trip_matches_text_format(tmp_path, dfa):
+    path = tmp_path / 'dfa.bin'
+    save_dfa_binary(dfa, path)
+    loaded = load_dfa(path)
+    via_text = parse_dfa_text(dfa_to_text(dfa))
+    assert dfa_to_text(loaded) == dfa_to_text(dfa) == dfa_to_text(via_text)
+    inputs = INPUTS
+    expected = [dfa.process(s) for s in inputs]
+    assert [loaded.process(s) for s in inputs] == expected
+    assert [via_text.process(s) for s in inputs] == expected
+
+
+def test_binary_round_trip_of_range_symbols(tmp_path):
+    # the table stores symbol classes, so overlapping ranges come back split
+    # into disjoint ones; the language is unchanged
+    dfa = DFA({'s', 't', 'u'}, {'a-z', r'\d', 'x'},
+              {('s', 'a-z'): 't', ('t', r'\d'): 't', ('s', 'x'): 'u'}, 's', {'t', 'u'})
+    path = tmp_path / 'dfa.bin'
+    save_dfa_binary(dfa, path)
+    loaded = load_dfa(path)
+    via_text = parse_dfa_text(dfa_to_text(loaded))
+    inputs = INPUTS + ['é', 'q9', 'x1']
+    expected = [dfa.process(s) for s in inputs]
+    assert [loaded.process(s) for s in inputs] == expected
+    assert [via_text.process(s) for s in inputs] == expected
+
+
+def test_binary_round_trip_twice_is_stable(tmp_path):
+    dfa = CASES[2]
+    first, second = tmp_path / 'a.bin', tmp_path / 'b.bin'
+    save_dfa_binary(dfa, first)
+    save_dfa_binary(load_dfa(first), second)
+    assert first.read_bytes() == second.read_bytes()
+
+
+@pytest.mark.parametrize('transition', [{'src': 'q0', 'sym': 'a'}, [5], {'src': 'q0', 'sym': 'a', 'dst': 1}])
+def test_malformed_json_transition_is_a_value_error(tmp_path, capsys, transition):
+    path = tmp_path / 'dfa.json'
+    path.write_text(json.dumps({'states': ['q0'], 'alphabet': ['a'], 'start': 'q0', 'finals': [],
+                                'transitions': [transition]}), encoding='utf-8')
+    with pytest.raises(ValueError, match='Invalid DFA JSON'):
+        load_dfa(path)
+    assert run_cli(['-d', str(path), '-']) != 0
+    assert 'Invalid DFA JSON' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('keep', [10, 80, -4])
+def test_truncated_binary_file_is_a_value_error(tmp_path, capsys, keep):
+    path = tmp_path / 'dfa.bin'
+    save_dfa_binary(CASES[3], path)
+    path.write_bytes(path.read_bytes()[:keep])
+    with pytest.raises(ValueError):
+        load_dfa(path)
+    assert run_cli(['-d', str(path), '-']) != 0
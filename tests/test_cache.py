@@ -0,0 +1,58 @@
+import os
+import time
+
+from Regex_Based_Text_Analyzer import DFA, ResultCache
+
+
+def _dfa():
+    return DFA({'s', 't'}, {'a'}, {('s', 'a'): 't', ('t', 'a'): 's'}, 's', {'t'})
+
+
+def _put(cache, key, size=300, when=None):
+    image = cache.scratch_path(key)
+    with open(image, 'wb') as fh:
+        fh.write(b'x' * size)
+    stored = cache.put(key, True, ['s', 't'], image)
+    if when is not None:
+        for name in (f"{key}.png", f"{key}.json"):
+            os.utime(cache.folder / name, (when, when))
+    return stored
+
+
+def test_keys_depend_on_dfa_input_and_options(tmp_path):
+    cache = ResultCache(tmp_path)
+    key = cache.key(_dfa(), 'a', heatmap=False)
+    assert key == cache.key(_dfa(), 'a', heatmap=False)
+    assert key != cache.key(_dfa(), 'aa', heatmap=False)
+    assert key != cache.key(_dfa(), 'a', heatmap=True)
+    # lazily built automata have no fingerprint and are not cached
+    assert cache.key(DFA.from_regex('a'), 'a') is None
+
+
+def test_miss_then_hit(tmp_path):
+    cache = ResultCache(tmp_path)
+    key = cache.key(_dfa(), 'a')
+    assert cache.get(key) is None
+    stored = _put(cache, key)
+    assert cache.get(key) == (True, ['s', 't'], stored)
+    assert open(stored, 'rb').read() == b'x' * 300
+    os.unlink(stored)
+    assert cache.get(key) is None  # an entry without its image is a miss
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=2500)
+    now = time.time()
+    # entries take about 400 bytes, so five fit and the sixth starts eviction
+    keys = [f"{i:064x}" for i in range(5)]
+    for i, key in enumerate(keys):
+        _put(cache, key, when=now - 100 + i)
+    # a hit makes the oldest entry the most recently used
+    assert cache.get(keys[0]) is not None
+    for i in range(5, 8):
+        key = f"{i:064x}"
+        keys.append(key)
+        _put(cache, key, when=now + i)
+    kept = {k for k in keys if cache.get(k) is not None}
+    assert keys[0] in kept and keys[1] not in kept and keys[-1] in kept
+    assert sum(f.stat().st_size for f in cache.folder.iterdir()) <= 2500
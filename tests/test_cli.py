@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from Regex_Based_Text_Analyzer import _CLI_VECTOR_MIN, run_cli
+
+
+def _verdicts(capsys, argv):
+    assert run_cli(argv) == 0
+    return [json.loads(line)['accepted'] for line in capsys.readouterr().out.splitlines()]
+
+
+@pytest.mark.parametrize('pattern', ['.*', '[^a]*', r'\D+'])
+def test_verdict_does_not_depend_on_batch_size(tmp_path, capsys, pattern):
+    # small batches take the trie walk, large ones the vectorized table
+    lines = ['é', 'a\x01', '日本', 'plain', '']
+    single = []
+    for line in lines:
+        path = tmp_path / 'one.txt'
+        path.write_text(line + '\n', encoding='utf-8')
+        single += _verdicts(capsys, ['-r', pattern, str(path)])
+    path = tmp_path / 'many.txt'
+    padding = ['x'] * _CLI_VECTOR_MIN
+    path.write_text('\n'.join(lines + padding) + '\n', encoding='utf-8')
+    assert _verdicts(capsys, ['-r', pattern, str(path)])[:len(lines)] == single
@@ -0,0 +1,42 @@
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA, LOD_FULL, LOD_PATH, LOD_SCC, DiagramView
+
+
+@pytest.mark.parametrize('lod', [LOD_FULL, LOD_PATH, LOD_SCC])
+def test_view_draws_states_missing_from_states(lod):
+    # q2 is only a transition target and q9 only on the path
+    dfa = DFA({'q0', 'q1'}, {'a', 'b'}, {('q0', 'a'): 'q1', ('q1', 'b'): 'q2'}, 'q0', {'q2'})
+    view = DiagramView(dfa, ['q0', 'q1', 'q2', 'q9'], lod)
+    assert set(view.node_of) == {'q0', 'q1', 'q2', 'q9'}
+    assert [e[3] for e in view.edges] == [[('q0', 'a')], [('q1', 'b')]]
+
+
+def test_scc_summaries_count_against_node_budget():
+    # 500 two-state cycles off the path: at most max_nodes nodes in all
+    transitions = {('s', 'a'): 's'}
+    for i in range(500):
+        transitions[(f'x{i}', 'a')] = f'y{i}'
+        transitions[(f'y{i}', 'a')] = f'x{i}'
+    dfa = DFA({'s'}, {'a'}, transitions, 's', {'s'})
+    view = DiagramView(dfa, ['s', 's'], LOD_SCC, max_nodes=10)
+    assert len(set(view.node_of.values())) == 10
+    assert len(view.node_of) == 1001
+    assert any(label.startswith('… ') for label in view.groups.values())
+
+
+def test_only_the_taken_parallel_edge_is_highlighted():
+    pytest.importorskip('graphviz')
+    dfa = DFA({'q0', 'q1'}, {'a', 'b'}, {('q0', 'a'): 'q1', ('q0', 'b'): 'q1'}, 'q0', {'q1'})
+    hits = dfa._edge_hits('a')
+    assert hits == {('q0', 'a'): 1}
+    f, edges = dfa._diagram(hits=hits, heatmap=True)
+    assert edges == {'e0': (('q0', 'a'),), 'e1': (('q0', 'b'),)}
+    lines = [line for line in f.source.splitlines() if '->' in line and 'id=e' in line]
+    assert ['penwidth' in line for line in lines] == [True, False]
+
+
+def test_range_hits_are_keyed_by_transition_symbol():
+    # the table has one column per class; hits map back to 'a-z' and 'x'
+    dfa = DFA({'q0', 'q1'}, {'a-z', 'x'}, {('q0', 'a-z'): 'q0', ('q0', 'x'): 'q1'}, 'q0', {'q1'})
+    assert dfa._edge_hits('abqx') == {('q0', 'a-z'): 3, ('q0', 'x'): 1}
@@ -0,0 +1,53 @@
+import itertools
+import random
+
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA, TRACE_ARRAY, TRACE_NONE, TRACE_RING
+
+WORDS = [''.join(p) for n in range(6) for p in itertools.product('abz', repeat=n)]
+
+
+def _random_dfa(num_states, seed):
+    rng = random.Random(seed)
+    states = [f"q{i}" for i in range(num_states)]
+    transitions = {(s, a): rng.choice(states) for s in states for a in 'ab' if rng.random() < 0.85}
+    return DFA(set(states), {'a', 'b'}, transitions, states[0], {s for s in states if rng.random() < 0.4})
+
+
+def _walk(dfa, word):
+    # reference simulation over the transition dict
+    path = [dfa.start_state]
+    for ch in word:
+        nxt = dfa.transitions.get((path[-1], ch))
+        if nxt is None:
+            return False, path
+        path.append(nxt)
+    return path[-1] in dfa.final_states, path
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_compiled_table_matches_transition_dict(seed):
+    dfa = _random_dfa(7, seed)
+    c = dfa.compile()
+    for word in WORDS:
+        accepted, path = _walk(dfa, word)
+        assert dfa.process(word) == (accepted, path)
+        assert dfa.process(word, TRACE_NONE) == (accepted, None)
+        ok, ids = dfa.process(word, TRACE_ARRAY)
+        assert ok == accepted and [c.state_names[i] for i in ids] == path
+        ok, ring = dfa.process(word, TRACE_RING, ring_size=3)
+        assert ok == accepted and list(ring) == path[-3:]
+
+
+def test_compile_again_after_mutation():
+    dfa = DFA({'s', 't'}, {'a'}, {('s', 'a'): 't'}, 's', {'t'})
+    assert not dfa.process('aa')[0]
+    dfa.transitions[('t', 'a')] = 't'
+    dfa.compile()
+    assert dfa.process('aa') == (True, ['s', 't', 't'])
+
+
+def test_unknown_trace_mode():
+    with pytest.raises(ValueError):
+        _random_dfa(3, 0).process('a', 'bogus')
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+import Regex_Based_Text_Analyzer as dfa_mod
+
+pytest.importorskip('graphviz')
+
+SVG = ('<svg width="100pt" height="50pt" viewBox="0.00 0.00 100.00 50.00" '
+       'xmlns="http://www.w3.org/2000/svg"><g/></svg>')
+
+
+def test_batch_reads_lazy_automaton_on_calling_thread(tmp_path, monkeypatch):
+    # pool threads may only render: simulation and graph building stay here
+    import graphviz
+
+    monkeypatch.setattr(graphviz.Digraph, 'pipe', lambda self, format=None, **kw: SVG.encode())
+    caller = threading.get_ident()
+    seen = []
+    for name in ('process', '_diagram', '_lod_view'):
+        original = getattr(dfa_mod.LazyDFA, name)
+
+        def spy(self, *args, _original=original, **kwargs):
+            seen.append(threading.get_ident())
+            return _original(self, *args, **kwargs)
+
+        monkeypatch.setattr(dfa_mod.LazyDFA, name, spy)
+    dfa = dfa_mod.DFA.from_regex('(a|b)*a(a|b)')
+    written = dfa_mod.export_results_batch(dfa, ['ab', 'ba', 'aab', 'bbb'], tmp_path, ('svg',), workers=4)
+    assert sorted(written) == [0, 1, 2, 3]
+    assert all((tmp_path / p).exists() for paths in written.values() for p in paths)
+    assert seen and set(seen) == {caller}
+    assert '<g id="annotation">' in (tmp_path / written[0][0]).read_text(encoding='utf-8')
+
+
+def test_cancelled_job_stops_before_rendering(tmp_path, monkeypatch):
+    from concurrent.futures import CancelledError
+
+    cancel = threading.Event()
+    dfa = dfa_mod.DFA.from_regex('(a|b)*a')
+    original = dfa_mod.LazyDFA.process
+
+    def process_then_cancel(self, *args, **kwargs):
+        # a newer run arrives while this one simulates
+        cancel.set()
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(dfa_mod.LazyDFA, 'process', process_then_cancel)
+    monkeypatch.setattr(dfa_mod.DiagramLayout, 'for_graph', pytest.fail)
+    with pytest.raises(CancelledError):
+        dfa_mod._test_job(dfa, 'aba', False, cancel=cancel)
+
+
+def test_uncached_renders_get_their_own_files(tmp_path, monkeypatch):
+    # lazily built automata are never cached; runs must not share ./dfa.png
+    class Layout:
+        def render(self, path, highlight):
+            with open(path, 'wb') as fh:
+                fh.write(b'png')
+
+    monkeypatch.setattr(dfa_mod.DiagramLayout, 'for_graph', lambda graph: Layout())
+    monkeypatch.chdir(tmp_path)
+    dfa = dfa_mod.DFA.from_regex('(a|b)*a')
+    first = dfa.visualize('ab')[2]
+    second = dfa.visualize('ba')[2]
+    assert first != second
+    assert all(map(dfa_mod.os.path.isfile, (first, second)))
+    assert not list(tmp_path.iterdir())
+    dfa_mod._discard_render(first)
+    assert not dfa_mod.os.path.exists(first)
+
+
+def test_layout_folder_is_bounded(tmp_path, monkeypatch):
+    import graphviz
+
+    monkeypatch.setattr(graphviz.Digraph, 'pipe', lambda self, format=None, **kw: b'{"bb": "0,0,10,10"}')
+    monkeypatch.setattr(dfa_mod, 'DEFAULT_LAYOUT_CACHE_BYTES', 200)
+    monkeypatch.setattr(dfa_mod.DiagramLayout, '_stores', {})
+    for i in range(40):
+        graph = graphviz.Digraph()
+        graph.node(f"n{i}")
+        dfa_mod.DiagramLayout.for_graph(graph, tmp_path)
+    folder = tmp_path / 'layouts'
+    assert sum(f.stat().st_size for f in folder.iterdir()) <= 200
+    assert (folder / f"{dfa_mod.DiagramLayout.for_graph(graph, tmp_path).key}.json").is_file()
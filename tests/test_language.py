@@ -0,0 +1,58 @@
+import itertools
+import random
+from collections import Counter
+
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA
+
+
+def _random_dfa(num_states, seed):
+    rng = random.Random(seed)
+    states = [f"q{i}" for i in range(num_states)]
+    transitions = {(s, a): rng.choice(states) for s in states for a in 'abc' if rng.random() < 0.8}
+    return DFA(set(states), set('abc'), transitions, states[0], {s for s in states if rng.random() < 0.4})
+
+
+def _accepted(dfa, length):
+    return [''.join(p) for p in itertools.product('abc', repeat=length) if dfa.process(''.join(p))[0]]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_count_and_enumerate_match_brute_force(seed):
+    dfa = _random_dfa(6, seed)
+    shortlex = []
+    for n in range(6):
+        words = _accepted(dfa, n)
+        assert dfa.count_accepted(n) == len(words)
+        shortlex += words
+    assert list(itertools.islice(dfa.enumerate_accepted(max_length=5), len(shortlex) + 1)) == shortlex
+
+
+def test_count_long_lengths_and_ranges():
+    # long lengths take the matrix-power path; counts are exact big ints
+    pytest.importorskip('numpy')
+    assert DFA.from_regex('(a|b)*').count_accepted(300) == 2 ** 300
+    assert DFA.from_regex('(ab)*').count_accepted(1000) == 1
+    assert DFA.from_regex('(ab)*').count_accepted(999) == 0
+    letters = DFA({'s'}, {'a-z'}, {('s', 'a-z'): 's'}, 's', {'s'})
+    assert letters.count_accepted(3) == 26 ** 3
+    with pytest.raises(ValueError):
+        letters.count_accepted(-1)
+
+
+def test_enumerate_stops_on_finite_language():
+    assert list(DFA.from_regex('abc|a|bc').enumerate_accepted()) == ['a', 'bc', 'abc']
+    assert list(DFA.from_regex('a*').enumerate_accepted(max_length=3)) == ['', 'a', 'aa', 'aaa']
+
+
+def test_sample_is_accepted_uniform_and_reproducible():
+    dfa = DFA.from_regex('(a|b)(a|b)c?')
+    picks = dfa.sample_accepted(2, count=4000, rng=random.Random(7))
+    assert picks == dfa.sample_accepted(2, count=4000, rng=random.Random(7))
+    seen = Counter(picks)
+    assert set(seen) == {'aa', 'ab', 'ba', 'bb'}
+    assert all(800 < n < 1200 for n in seen.values())
+    assert all(dfa.process(w)[0] for w in dfa.sample_accepted(3, count=20))
+    with pytest.raises(ValueError):
+        dfa.sample_accepted(5)
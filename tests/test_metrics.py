@@ -0,0 +1,24 @@
+import threading
+
+from Regex_Based_Text_Analyzer import Metrics
+
+
+def test_capture_counts_only_its_own_thread():
+    metrics = Metrics(enabled=True)
+    inside = threading.Event()
+    done = threading.Event()
+
+    def other():
+        inside.wait()
+        metrics.count('steps', 100)
+        done.set()
+
+    worker = threading.Thread(target=other)
+    worker.start()
+    with metrics.capture() as run:
+        metrics.count('steps', 3)
+        inside.set()
+        done.wait()
+    worker.join()
+    assert run.counters == {'steps': 3}
+    assert metrics.counters['steps'] == 103
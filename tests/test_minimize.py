@@ -0,0 +1,54 @@
+import itertools
+import random
+
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA
+
+WORDS = [''.join(p) for n in range(8) for p in itertools.product('ab', repeat=n)]
+
+
+def _random_dfa(num_states, seed):
+    rng = random.Random(seed)
+    states = [f"q{i}" for i in range(num_states)]
+    transitions = {(s, a): rng.choice(states) for s in states for a in 'ab' if rng.random() < 0.9}
+    return DFA(set(states), {'a', 'b'}, transitions, states[0], {s for s in states if rng.random() < 0.3})
+
+
+def test_minimize_merges_equivalent_states_and_drops_unreachable():
+    # ends in 'a'; q1 and q2 are equivalent, q3 is unreachable
+    transitions = {('q0', 'a'): 'q1', ('q0', 'b'): 'q0', ('q1', 'a'): 'q2', ('q1', 'b'): 'q0',
+                   ('q2', 'a'): 'q1', ('q2', 'b'): 'q0', ('q3', 'a'): 'q0', ('q3', 'b'): 'q3'}
+    dfa = DFA({'q0', 'q1', 'q2', 'q3'}, {'a', 'b'}, transitions, 'q0', {'q1', 'q2'})
+    minimal, mapping = dfa.minimize()
+    assert len(minimal.states) == 2
+    assert mapping == {'q0': 'q0', 'q1': 'q1', 'q2': 'q1'}
+    assert [minimal.process(w)[0] for w in WORDS] == [dfa.process(w)[0] for w in WORDS]
+
+
+def _future(dfa, state, words):
+    # acceptance of each word read from `state`
+    start = DFA(dfa.states, dfa.alphabet, dfa.transitions, state, dfa.final_states)
+    return tuple(start.process(w)[0] for w in words)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_minimize_preserves_language_and_is_minimal(seed):
+    dfa = _random_dfa(8, seed)
+    minimal, mapping = dfa.minimize()
+    assert [minimal.process(w)[0] for w in WORDS] == [dfa.process(w)[0] for w in WORDS]
+    # with its dead state an 8-state DFA has 9 states, and two that differ do
+    # so on a word of at most 7 characters; so the futures over WORDS of the
+    # reachable states, less the dead one, count the Myhill-Nerode classes
+    futures = {_future(dfa, state, WORDS) for state in mapping}
+    futures.discard((False,) * len(WORDS))
+    assert len(minimal.states) == max(len(futures), 1)
+    for state, image in mapping.items():
+        assert _future(dfa, state, WORDS) == _future(minimal, image, WORDS)
+
+
+def test_minimize_empty_language_keeps_lone_start_state():
+    dfa = DFA({'s', 't'}, {'a'}, {('s', 'a'): 't', ('t', 'a'): 's'}, 's', set())
+    minimal, _ = dfa.minimize()
+    assert minimal.states == {'s'} and not minimal.final_states
+    assert not any(minimal.process(w)[0] for w in ['', 'a', 'aa'])
@@ -0,0 +1,57 @@
+import itertools
+import random
+
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA
+
+WORDS = [''.join(p) for n in range(7) for p in itertools.product('ab', repeat=n)]
+
+
+def _random_dfa(num_states, seed):
+    rng = random.Random(seed)
+    states = [f"q{i}" for i in range(num_states)]
+    transitions = {(s, a): rng.choice(states) for s in states for a in 'ab' if rng.random() < 0.9}
+    return DFA(set(states), {'a', 'b'}, transitions, states[0], {s for s in states if rng.random() < 0.4})
+
+
+def test_equivalent_regex_and_hand_built_dfa():
+    # strings over {a, b} ending in "abb"
+    t = {('0', 'a'): '1', ('0', 'b'): '0', ('1', 'a'): '1', ('1', 'b'): '2',
+         ('2', 'a'): '1', ('2', 'b'): '3', ('3', 'a'): '1', ('3', 'b'): '0'}
+    hand = DFA({'0', '1', '2', '3'}, {'a', 'b'}, t, '0', {'3'})
+    assert hand.equivalent(DFA.from_regex('(a|b)*abb'))
+    assert hand.counterexample(DFA.from_regex('(a|b)*abb')) is None
+
+
+@pytest.mark.parametrize('left, right, witness', [
+    ('(ab)*', '(ab)*a?', 'a'),
+    ('a*', 'a*b?', 'b'),
+    ('(a|b)*', '', 'a'),
+    ('a+', 'a*', ''),
+])
+def test_counterexample_is_shortest_then_first(left, right, witness):
+    assert DFA.from_regex(left).counterexample(DFA.from_regex(right)) == witness
+    assert not DFA.from_regex(left).equivalent(DFA.from_regex(right))
+
+
+@pytest.mark.parametrize('seed', range(15))
+def test_counterexample_matches_brute_force(seed):
+    a, b = _random_dfa(5, seed), _random_dfa(5, seed + 100)
+    differing = [w for w in WORDS if a.process(w)[0] != b.process(w)[0]]
+    witness = a.counterexample(b)
+    if differing:
+        assert witness == differing[0]
+    elif witness is not None:
+        # longer than every word tried
+        assert len(witness) > len(WORDS[-1]) and a.process(witness)[0] != b.process(witness)[0]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_boolean_products(seed):
+    a, b = _random_dfa(6, seed), _random_dfa(6, seed + 50)
+    for w in WORDS:
+        x, y = a.process(w)[0], b.process(w)[0]
+        assert a.intersection(b).process(w)[0] == (x and y)
+        assert a.union(b).process(w)[0] == (x or y)
+        assert a.difference(b).process(w)[0] == (x and not y)
@@ -0,0 +1,41 @@
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA
+
+INPUTS = ['', 'a', 'ab', 'aé\x01', '\x00\n', '日本 語', 'a\nb', 'x\x7f', 'c1 ', 'abab', '\U0001f600']
+
+
+@pytest.mark.parametrize('pattern', ['.*', '[^a]+', r'\D*', '(ab|c)*x?', 'a.b', r'\w+\s?', '日.*'])
+def test_table_apis_agree_with_process(pattern):
+    # the table built by compile() must cover every character the lazy walk does
+    dfa = DFA.from_regex(pattern)
+    expected = [dfa.process(s)[0] for s in INPUTS]
+    assert dfa.accepts_many(INPUTS).tolist() == expected
+    assert dfa.accepts_trie(INPUTS) == expected
+    eager = DFA.from_regex(pattern, lazy=False)
+    assert [eager.process(s)[0] for s in INPUTS] == expected
+    assert eager.accepts_many(INPUTS).tolist() == expected
+
+
+def test_process_stream_reads_control_bytes():
+    assert DFA.from_regex('.*').process_stream(b'\x01\x02\xff')[0]
+    assert not DFA.from_regex('[^\x02]*').process_stream(b'\x01\x02')[0]
+
+
+def test_clone_has_its_own_state_cache():
+    dfa = DFA.from_regex('(ab|c)*x?')
+    dfa.process('ab')
+    known = set(dfa.states)
+    dup = dfa.clone()
+    assert len(dup.states) == 1
+    assert [dup.process(s)[0] for s in INPUTS] == [DFA.from_regex('(ab|c)*x?').process(s)[0] for s in INPUTS]
+    assert set(dfa.states) == known
+
+
+def test_lazy_counts_use_path_state_names():
+    dfa = DFA.from_regex('(ab)*c')
+    accepted, path = dfa.process('ababc')
+    counted, counts = dfa.process('ababc', 'counts')
+    assert counted == accepted
+    assert dfa.edge_counts(counts) == {('d1', 'a'): 2, ('d2', 'b'): 2, ('d1', 'c'): 1}
+    assert {src for src, _ in counts} <= set(path)
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA, Scanner
+
+
+def _brute(dfas, text):
+    # longest non-empty match at each position, earliest pattern on ties;
+    # scanning resumes after a match or one character on
+    out, i = [], 0
+    while i < len(text):
+        best = None
+        for j in range(i + 1, len(text) + 1):
+            for tag, dfa in enumerate(dfas):
+                if dfa.process(text[i:j])[0]:
+                    best = (i, j, tag)
+                    break
+        if best:
+            out.append(best)
+            i = best[1]
+        else:
+            i += 1
+    return out
+
+
+@pytest.mark.parametrize('pattern', ['ab*', 'a|ab|abc', '(ab)+', 'b*c'])
+def test_finditer_is_leftmost_longest(pattern):
+    rng = random.Random(pattern)
+    dfa = DFA.from_regex(pattern)
+    for _ in range(30):
+        text = ''.join(rng.choice('abcx') for _ in range(rng.randrange(20)))
+        assert list(dfa.finditer(text)) == [(i, j) for i, j, _ in _brute([dfa], text)]
+
+
+def test_finditer_skips_empty_matches():
+    assert list(DFA.from_regex('a*').finditer('baab')) == [(1, 3)]
+
+
+def test_scanner_prefers_longest_then_earliest_pattern():
+    keyword, ident, number = (DFA.from_regex(p) for p in ('if', '[a-z]+', '[0-9]+'))
+    scanner = Scanner([keyword, ident, number])
+    text = 'if iff x1 42if'
+    assert list(scanner.finditer(text)) == [(0, 2, 0), (3, 6, 1), (7, 8, 1), (8, 9, 2), (10, 12, 2), (12, 14, 0)]
+    assert list(scanner.finditer(text)) == _brute([keyword, ident, number], text)
+    assert scanner.counts(text) == [2, 2, 2]
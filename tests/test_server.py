@@ -0,0 +1,113 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+import dfa_server
+from Regex_Based_Text_Analyzer import DFA
+
+
+def _serve(tmp_path, **kwargs):
+    # Server on a Unix socket, run by an event loop on a background thread
+    path = str(tmp_path / 'dfa.sock')
+    loop = asyncio.new_event_loop()
+    server = dfa_server.DFAServer(path, **kwargs)
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def drain():
+        # let the connection handlers see the clients' EOF and finish
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        if others:
+            await asyncio.wait(others, timeout=5)
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(drain(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        server.close()
+        loop.close()
+
+    return path, stop
+
+
+def test_regex_covers_non_ascii(tmp_path):
+    path, stop = _serve(tmp_path, workers=1)
+    try:
+        with dfa_server.DFAClient(path) as client:
+            key = client.register(regex='.*')
+            assert client.evaluate(key, ['é', 'a\x01', '']) == [True, True, True]
+            key = client.register(regex='[^a]+')
+            assert client.evaluate(key, ['日本', 'a', 'ba']) == [True, False, False]
+    finally:
+        stop()
+
+
+def test_slow_batch_does_not_block_other_connections(tmp_path, monkeypatch):
+    release = threading.Event()
+    evaluate = dfa_server.evaluate
+
+    def slow(dfa, inputs, with_path=False):
+        release.wait(5)
+        return evaluate(dfa, inputs, with_path)
+
+    monkeypatch.setattr(dfa_server, 'evaluate', slow)
+    path, stop = _serve(tmp_path, workers=2)
+    try:
+        with dfa_server.DFAClient(path, pool_size=2) as client:
+            key = client.register(regex='a*')
+            results = []
+            batch = threading.Thread(target=lambda: results.append(client.evaluate(key, ['aa', 'b'])))
+            batch.start()
+            time.sleep(0.1)
+            t0 = time.perf_counter()
+            assert client.call('ping') == {'ok': True}
+            assert time.perf_counter() - t0 < 1
+            release.set()
+            batch.join()
+            assert results == [[True, False]]
+    finally:
+        release.set()
+        stop()
+
+
+def test_dropped_blob_kept_until_released(tmp_path):
+    registry = dfa_server.Registry(tmp_path)
+    key = registry.add(DFA({'q0'}, {'a'}, {('q0', 'a'): 'q0'}, 'q0', {'q0'}))
+    dfa, blob = registry.acquire_blob(key)
+    registry.write_blob(dfa, blob)
+    assert registry.drop(key)
+    assert os.path.exists(blob)
+    registry.release_blob(key)
+    assert not os.path.exists(blob)
+
+
+def test_file_registration_confined_to_load_dir(tmp_path):
+    dfa = DFA({'q0'}, {'a'}, {('q0', 'a'): 'q0'}, 'q0', {'q0'})
+    allowed = tmp_path / 'dfas'
+    allowed.mkdir()
+    dfa.save_binary(str(allowed / 'a.bin'))
+    dfa.save_binary(str(tmp_path / 'secret.bin'))
+    os.symlink(tmp_path / 'secret.bin', allowed / 'link.bin')
+
+    path, stop = _serve(tmp_path, workers=1)
+    try:
+        with dfa_server.DFAClient(path) as client:
+            with pytest.raises(ValueError, match='disabled'):
+                client.register(file=str(allowed / 'a.bin'))
+    finally:
+        stop()
+
+    path, stop = _serve(tmp_path, workers=1, load_dir=allowed)
+    try:
+        with dfa_server.DFAClient(path) as client:
+            key = client.register(file='a.bin')
+            assert client.evaluate(key, ['aa', 'b']) == [True, False]
+            for name in ('../secret.bin', str(tmp_path / 'secret.bin'), 'link.bin'):
+                with pytest.raises(ValueError, match='outside the load directory'):
+                    client.register(file=name)
+    finally:
+        stop()
@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA
+
+pytest.importorskip('numpy')
+
+
+def _parity():
+    # even number of 'a'
+    return DFA({'e', 'o'}, {'a', 'b'}, {('e', 'a'): 'o', ('e', 'b'): 'e', ('o', 'a'): 'e', ('o', 'b'): 'o'},
+               'e', {'e'})
+
+
+@pytest.mark.parametrize('data', [b'ab' * 50000 + b'a', b'ab' * 30000 + b'c' + b'b' * 40000])
+def test_process_parallel_accepts_stream_sources(tmp_path, data):
+    # parity keeps two states apart, so it needs more workers than that to
+    # take the pool path
+    dfa = _parity()
+    expected = dfa.process_stream(data)
+    path = tmp_path / 'input.bin'
+    path.write_bytes(b'xx' + data)
+    assert dfa.process_parallel(data, workers=3, chunk_size=16384) == expected
+    assert dfa.process_parallel(io.BytesIO(data), workers=3, chunk_size=16384) == expected
+    with open(path, 'rb') as fh:
+        fh.seek(2)
+        assert dfa.process_parallel(fh, workers=3, chunk_size=16384) == expected
+        assert fh.read() == b''
+
+
+def test_process_parallel_falls_back_when_states_do_not_merge(monkeypatch):
+    import concurrent.futures
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("the pool should not be started")
+
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', no_pool)
+    data = b'ab' * 50000
+    dfa = _parity()
+    assert dfa.process_parallel(data, workers=2, chunk_size=16384) == dfa.process_stream(data)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_process_stream_sources_and_chunk_boundaries(tmp_path, chunk_size):
+    dfa = _parity()
+    data = b'abba' * 1000 + b'a'
+    path = tmp_path / 'input.bin'
+    path.write_bytes(data)
+    expected = (False, len(data), None)
+    assert dfa.process_stream(data, chunk_size) == expected
+    assert dfa.process_stream(str(path), chunk_size) == expected
+    assert dfa.process_stream(memoryview(data), chunk_size) == expected
+    with open(path, 'rb') as fh:
+        assert dfa.process_stream(fh, chunk_size) == expected
+
+
+def test_process_stream_reports_first_undefined_transition():
+    # 'c' has no transition; consumed stops there and fail_pos is its offset
+    assert _parity().process_stream(b'ab' * 10 + b'c' + b'a', 3) == (False, 20, 20)
+    assert _parity().process_stream(b'') == (True, 0, None)
@@ -0,0 +1,45 @@
+import pytest
+
+from Regex_Based_Text_Analyzer import DFA, _symbol_classes, is_range_symbol
+
+
+def test_overlapping_ranges_split_into_classes():
+    labels, cover = _symbol_classes({'a-m', 'h-z'})
+    assert labels == ['a-g', 'h-m', 'n-z']
+    assert cover == {'a-m': [0, 1], 'h-z': [1, 2]}
+
+
+def test_symbols_naming_the_same_characters_share_a_class():
+    labels, cover = _symbol_classes({'0-9', r'\d', 'a-z', 'x', 'ab'})
+    assert cover['0-9'] == cover[r'\d'] and len(cover[r'\d']) == 1
+    assert cover['x'][0] in cover['a-z'] and len(cover['a-z']) == 2
+    # a plain multi-character symbol gets a class of its own, after the ranges
+    assert labels[-1] == 'ab'
+
+
+def test_range_symbols():
+    assert is_range_symbol('a-z') and is_range_symbol(r'\d') and is_range_symbol(r'\p{Lu}')
+    assert is_range_symbol('[a-c_]')
+    assert not is_range_symbol('a') and not is_range_symbol('ab')
+    with pytest.raises(ValueError):
+        is_range_symbol('z-a')
+
+
+def test_range_table_has_one_column_per_class():
+    dfa = DFA({'s', 't'}, {'a-z', 'x', r'\d'},
+              {('s', 'a-z'): 's', ('s', 'x'): 't', ('s', r'\d'): 't'}, 's', {'t'})
+    c = dfa.compile()
+    assert c.width == 3 + 1  # digits, letters but x, x; plus unknown characters
+    # the plain 'x' takes precedence over the range that contains it
+    cases = {'abc': False, 'abx': True, 'q7': True, 'x7': False, 'a!': False, '': False, 'é': False}
+    assert {w: dfa.process(w)[0] for w in cases} == cases
+    pytest.importorskip('numpy')
+    assert dfa.accepts_many(list(cases)).tolist() == list(cases.values())
+
+
+def test_overlapping_ranges_must_agree():
+    agree = DFA({'s', 't'}, {'a-m', 'h-z'}, {('s', 'a-m'): 't', ('s', 'h-z'): 't'}, 's', {'t'})
+    assert agree.process('k')[0] and agree.process('z')[0]
+    disagree = DFA({'s', 't'}, {'a-m', 'h-z'}, {('s', 'a-m'): 't', ('s', 'h-z'): 's'}, 's', {'t'})
+    with pytest.raises(ValueError, match='Overlapping ranges'):
+        disagree.compile()